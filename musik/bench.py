@@ -0,0 +1,184 @@
+# bench.py
+# Render throughput benchmark for Ben's Mega Synth
+#
+#   python bench.py                       quick corpus, JSON report on stdout
+#   python bench.py --full -o report.json full cross product
+#   python bench.py --baseline old.json   exit 1 if median RTF regressed
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import itertools
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import synther
+
+FX_COMBOS = {
+    "dry":      {"rev": 0.0, "dly": 0.0, "bit": 0.0, "gb": False},
+    "reverb":   {"rev": 0.4, "dly": 0.0, "bit": 0.0, "gb": False},
+    "delay":    {"rev": 0.0, "dly": 0.2, "bit": 0.0, "gb": False},
+    "bitcrush": {"rev": 0.0, "dly": 0.0, "bit": 0.5, "gb": False},
+    "gameboy":  {"rev": 0.0, "dly": 0.0, "bit": 0.0, "gb": True},
+    "all":      {"rev": 0.4, "dly": 0.2, "bit": 0.5, "gb": False},
+}
+
+
+def voice_count(code):
+    cx = synther.compute_complexity(code)
+    return min(2 + int(cx * 3), 5)
+
+
+def pick_code(wave, voices):
+    """First code (in a fixed walk over all 7-digit codes) with this wave type and voice count."""
+    if voices == 5:
+        # Only an all-nines code is complex enough for the texture voice.
+        return 9999999 if wave == 3 else None
+    for code in range(1000003, 10000000, 7919):
+        if synther.parse_code(code)[1] == wave and voice_count(code) == voices:
+            return code
+    return None
+
+
+def build_corpus(full=False):
+    """Yield (name, code, settings) cases.
+
+    The quick corpus varies one dimension at a time around a default case;
+    --full renders the whole cross product.
+    """
+    codes = []
+    for wave, voices in itertools.product(range(4), range(2, 6)):
+        code = pick_code(wave, voices)
+        if code is not None:
+            codes.append((wave, voices, code))
+    base = {"scale": "Major", "preset": "Pad", "drums": True}
+
+    if full:
+        for (wave, voices, code), scale, fx in itertools.product(codes, synther.SCALES, FX_COMBOS):
+            yield f"w{wave}-v{voices}-{scale}-{fx}", code, dict(base, scale=scale, **FX_COMBOS[fx])
+        return
+
+    for wave, voices, code in codes:
+        yield f"w{wave}-v{voices}", code, dict(base, **FX_COMBOS["reverb"])
+    ref = codes[len(codes) // 2][2]
+    for scale in synther.SCALES:
+        yield f"scale-{scale}", ref, dict(base, scale=scale, **FX_COMBOS["reverb"])
+    for fx in FX_COMBOS:
+        yield f"fx-{fx}", ref, dict(base, **FX_COMBOS[fx])
+    yield "no-drums", ref, dict(base, drums=False, **FX_COMBOS["reverb"])
+
+
+def peak_rss_kb():
+    """Peak RSS of the whole run so far; only meaningful once, in the summary."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere.
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+def run(corpus, seconds, out_dir):
+    sink = synther.MemorySink()
+    synth = synther.BenSynth(background_init=False, keep_warm=True,
+                             instrument=synther.Instrumentation([sink]))
+    results = []
+    for name, code, settings in corpus:
+        kwargs = synther.settings_to_kwargs(dict(settings, length=seconds))
+        sink.clear()
+        start = time.perf_counter()
+        synth.build_and_play(code, export_file=os.path.join(out_dir, f"{name}.wav"),
+                             offline=True, **kwargs)
+        wall = time.perf_counter() - start
+        audio = seconds + synther.RELEASE_TAIL
+        stages = {e["name"]: round(e["seconds"], 4) for e in sink.events if e["type"] == "span"}
+        counters = {}
+        for e in sink.events:
+            if e["type"] == "counters":
+                counters.update(e["values"])
+        results.append({
+            "name": name,
+            "code": code,
+            "settings": settings,
+            "wall_s": round(wall, 4),
+            "rtf": round(audio / wall, 2) if wall > 0 else None,
+            # Objects the engine tracks; implicit arithmetic/trigger objects are not included.
+            "objects": counters.get("dsp_objects"),
+            "stages_s": stages,
+        })
+        print(f"[Bench] {name:<24} {results[-1]['rtf']}x realtime", file=sys.stderr)
+    synth.stop_server()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark synther render throughput")
+    parser.add_argument("--seconds", type=int, default=20, help="audio length per render")
+    parser.add_argument("--full", action="store_true", help="render the full cross product")
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="earlier report to compare median RTF against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed median RTF drop vs. baseline (default 10%%)")
+    args = parser.parse_args(argv)
+
+    # The report owns stdout; engine chatter (including pyo's) goes to stderr.
+    sys.stdout.flush()
+    report_out = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    with tempfile.TemporaryDirectory(prefix="synther-bench-") as out_dir:
+        results = run(build_corpus(args.full), args.seconds, out_dir)
+
+    rtfs = [r["rtf"] for r in results if r["rtf"]]
+    report = {
+        "engine_version": synther.ENGINE_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seconds": args.seconds,
+        "summary": {
+            "renders": len(results),
+            "median_rtf": median(rtfs),
+            "min_rtf": min(rtfs) if rtfs else None,
+            "peak_rss_kb": peak_rss_kb(),
+        },
+        "results": results,
+    }
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            old = json.load(f)["summary"]["median_rtf"]
+        new = report["summary"]["median_rtf"]
+        report["baseline_median_rtf"] = old
+        if old and new is not None and new < old * (1.0 - args.tolerance):
+            print(f"[Bench] REGRESSION: median RTF {new} vs baseline {old}", file=sys.stderr)
+            status = 1
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        report_out.write(text + "\n")
+    report_out.close()
+    return status
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,49 +1,122 @@
 # ben_full_synth_with_presets_and_queue.py
 # Ben's Mega Synth – UI+Preset Editor+Export Queue
 
+import time
+_import_start = time.perf_counter()
+
 import os
 script_dir = os.path.dirname(os.path.abspath(__file__))
-os.chdir(script_dir)
 
-import glob
-from pyo import *
-import pyo
+import sys
+import atexit
+import importlib
+import importlib.util
 import random
-import time
+import math
+import multiprocessing
 import threading
-import tkinter as tk
-from tkinter import ttk, simpledialog, filedialog, messagebox
+import argparse
+import hashlib
+import shutil
+import signal
+import struct
+import tempfile
 import json
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, CancelledError
+from concurrent.futures.process import BrokenProcessPool
 
-global SineTable
 
-try:
-    import vlc
-    from vlc import *
-except ImportError:
-    print("[Warning] VLC not available")
+class _LazyModule:
+    """Module stand-in that imports the real module on first attribute access.
 
-try:
-    import sounddevice as sd
-    HAS_SOUNDDEVICE = True
-except ImportError:
-    HAS_SOUNDDEVICE = False
-    sd = None
+    Keeps `import synther` cheap: render workers never load tkinter, and
+    tools that only parse codes or read presets never load pyo or numpy.
+    """
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
 
-try:
-    import ctypes
-    def msgbox(text, title="DEBUG"):
-        try:
-            ctypes.windll.user32.MessageBoxW(0, str(text), str(title), 0)
-        except Exception:
-            print(f"{title}: {text}")
-except Exception:
-    def msgbox(text, title="DEBUG"):
+    def _load(self):
+        if self._module is None:
+            self.__dict__["_module"] = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        value = getattr(self._load(), attr)
+        # Cache on the proxy so hot lookups skip __getattr__ next time.
+        self.__dict__[attr] = value
+        return value
+
+
+def _has_module(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+pyo = _LazyModule("pyo")
+# Only the render service needs an event loop.
+asyncio = _LazyModule("asyncio")
+np = _LazyModule("numpy")
+soundfile = _LazyModule("soundfile")
+sd = _LazyModule("sounddevice")
+# tkinter is only needed by FullGUI; headless render workers may not have it.
+tk = _LazyModule("tkinter")
+ttk = _LazyModule("tkinter.ttk")
+simpledialog = _LazyModule("tkinter.simpledialog")
+filedialog = _LazyModule("tkinter.filedialog")
+messagebox = _LazyModule("tkinter.messagebox")
+
+# Availability is checked without importing anything.
+HAS_TK = _has_module("_tkinter")
+HAS_SOUNDDEVICE = _has_module("sounddevice")
+HAS_SOUNDFILE = _has_module("soundfile")
+HAS_NUMPY = _has_module("numpy")
+
+
+def msgbox(text, title="DEBUG"):
+    try:
+        import ctypes
+        ctypes.windll.user32.MessageBoxW(0, str(text), str(title), 0)
+    except Exception:
         print(f"{title}: {text}")
 
 # ---------------- Constants & Helpers ----------------
 MAX_INST = 14
-PRESET_FILE = "presets.json"
+PRESET_FILE = os.path.join(script_dir, "presets.json")
+
+# Every render keeps recording for this long after `length`: the patterns
+# stop and the master fades out over STOP_FADE, then the last notes ring
+# out in silence. Live renders stop recording after the same tail, so live
+# and offline renders produce the same file.
+RELEASE_TAIL = 0.7
+OFFLINE_SR = 44100
+OFFLINE_BUFFERSIZE = 256
+
+# Bump whenever a change alters rendered audio, so cached renders of the old
+# engine are no longer served.
+ENGINE_VERSION = 7
+
+# Live server configs, tried in order until one constructs, after the
+# probed profile from audio_profile.json when there is one.
+SERVER_CONFIGS = [
+    {"buffersize": 2048, "sr": 44100},
+    {"buffersize": 1024, "sr": 44100},
+    {"buffersize": 512, "sr": 44100},
+    {},
+]
+RENDER_CACHE_DIR = os.path.join(script_dir, "render_cache")
+RENDER_CACHE_MAX_BYTES = 2 * 1024 ** 3
+# Dry stems kept next to cached renders so FX-only changes skip synthesis.
+STEM_NAMES = ("voices", "drums")
 
 ROOTS = [48, 50, 52, 53, 55, 57, 59, 60, 62, 64, 65, 67]
 SCALES = {
@@ -65,9 +138,10 @@ DEFAULT_PRESETS = {
     "Chiptune Bassline": {"attack":0.001,"decay":0.02,"sustain":0.7,"release":0.08,"mul":0.9}
 }
 
-if not os.path.exists(PRESET_FILE):
-    with open(PRESET_FILE, "w") as f:
-        json.dump(DEFAULT_PRESETS, f, indent=2)
+# Preset "mul" is relative to this, so the default Pad keeps the mix levels
+# the engine had before presets were applied.
+PRESET_MUL_REF = 0.5
+ENV_TABLE_SIZE = 8192
 
 
 def mtof(m):
@@ -134,18 +208,67 @@ def melody_step(scale, current_step, complexity, rng):
         return rng.choice(scale)
 
 
+DRUM_STEPS = 16      # 16th notes per bar
+DRUM_BARS = 4        # bars per phrase before the pattern loops
+DRUM_BUCKETS = 8     # complexity resolution of the pattern index
+DRUM_SEEDS = 1000
+
+
+def generate_drum_bars(bucket, seed):
+    """Kick, snare and hat for one phrase, each a tuple of 16-bit masks (bit n = step n)."""
+    rng = random.Random(bucket * DRUM_SEEDS + seed)
+    density = (bucket + 0.5) / DRUM_BUCKETS
+    kicks, snares, hats = [], [], []
+    for bar in range(DRUM_BARS):
+        kick = [0, 8] + ([4, 12] if bucket >= 2 else [])
+        snare = [4, 12]
+        hat = list(range(0, DRUM_STEPS, 2))
+        for step in range(DRUM_STEPS):
+            # Syncopated kicks off the beat, ghost snares and 16th hats
+            # become more likely as complexity goes up.
+            if step % 4 and rng.random() < density * 0.25:
+                kick.append(step)
+            if step % 2 and rng.random() < density * 0.15:
+                snare.append(step)
+            if step % 2 and (bucket >= 6 or rng.random() < density * 0.4):
+                hat.append(step)
+        if bar == DRUM_BARS - 1 and bucket >= 3:
+            # Snare fill into the next phrase.
+            snare += [step for step in range(12, DRUM_STEPS) if rng.random() < density]
+        kicks.append(sum(1 << step for step in set(kick)))
+        snares.append(sum(1 << step for step in set(snare)))
+        hats.append(sum(1 << step for step in set(hat)))
+    return tuple(kicks), tuple(snares), tuple(hats)
+
+
 class DrumEngine:
-    """Simple drum pattern generator"""
+    """Complexity- and seed-driven drum patterns.
+
+    A phrase is DRUM_BARS bars of 16-step bitmasks per drum. Phrases are
+    memoized in a class-wide index keyed by (complexity bucket, seed), so
+    every code that maps to the same key shares one entry. Entries are
+    filled on first use: one phrase takes well under a millisecond, while
+    the whole index would cost each render worker about half a second.
+    """
+    _index = {}
+
     def __init__(self, complexity, seed=0):
         self.complexity = complexity
-        self.rng = random.Random(seed)
-    
+        self.bucket = min(max(int(complexity * DRUM_BUCKETS), 0), DRUM_BUCKETS - 1)
+        self.seed = seed % DRUM_SEEDS
+
     def patterns(self):
-        """Return kick, snare, hat patterns (placeholder)"""
-        kick = [1, 0, 0, 0, 1, 0, 0, 0]
-        snare = [0, 0, 1, 0, 0, 0, 1, 0]
-        hat = [1, 1, 1, 1, 1, 1, 1, 1]
-        return kick, snare, hat
+        """Return kick, snare, hat as tuples of one 16-bit mask per bar."""
+        key = (self.bucket, self.seed)
+        bars = self._index.get(key)
+        if bars is None:
+            bars = self._index[key] = generate_drum_bars(*key)
+        return bars
+
+    def steps(self):
+        """Unpack the masks to one 0/1 list per drum over a whole phrase."""
+        return [[(mask >> step) & 1 for mask in masks for step in range(DRUM_STEPS)]
+                for masks in self.patterns()]
 
 
 def midiToHz(midi_note):
@@ -153,62 +276,1353 @@ def midiToHz(midi_note):
     return 440.0 * (2.0 ** ((midi_note - 69) / 12.0))
 
 
+def plan_render(code, scale_name="Major", tempo_override=None, length_override=None):
+    """Resolve everything a render derives from the code and the UI settings."""
+    try:
+        code_int = int(code)
+    except Exception:
+        code_int = 0
+
+    inst_count, wave_type, length, s = parse_code(code_int)
+    if length_override is not None:
+        length = int(length_override)
+
+    cx = ChaosBrake().clamp(compute_complexity(code_int))
+    tempo = tempo_override if tempo_override else 90 + int(cx * 40)
+    if scale_name not in SCALES:
+        scale_name = "Major"
+    return {
+        "code_int": code_int,
+        "digits": s,
+        "wave_type": wave_type,
+        "length": length,
+        "cx": cx,
+        "tempo": tempo,
+        "beat_time": 60.0 / tempo,
+        "scale_name": scale_name,
+        "scale": SCALES[scale_name],
+        "root_note": 48,
+        "voice_count": min(2 + int(cx * 3), 5),
+    }
+
+
+def compile_sequence(code_int, scale, complexity, steps, root_note=48, with_lead=True):
+    """Precompute bass and lead frequencies for every 16th step of a track.
+
+    The bass walks the scale once per beat and the lead follows melody_step
+    with an rng seeded from the code, so the arrays depend only on the inputs.
+    """
+    rng = random.Random(code_int)
+    bass = array('f')
+    lead = array('f')
+    for step in range(steps):
+        deg = scale[(step // 4) % len(scale)]
+        bass.append(midiToHz(root_note + deg))
+        if with_lead:
+            note = melody_step(scale, step % len(scale), complexity, rng)
+            lead.append(midiToHz(root_note + note + 12))
+    return bass, lead
+
+
+# ---------------- Preset Store ----------------
+class PresetStore:
+    """presets.json served from memory and reloaded when it changes on disk.
+
+    Edits are appended to a journal next to the file (one JSON op per line)
+    and folded back into presets.json with an atomic write-temp-and-rename
+    once the journal passes `compact_every` entries. A crash mid-save leaves
+    at worst a torn last journal line; load() skips it without touching the
+    file and the next save cuts it off under the lock before appending.
+    """
+    def __init__(self, path=PRESET_FILE, journal=True, compact_every=64):
+        self.path = path
+        self.journal_path = path + ".journal" if journal else None
+        self.compact_every = compact_every
+        self.lock = threading.RLock()
+        self.presets = {}
+        self._stamp = None
+        self._journal_len = 0
+        self._journal_good = None  # byte length of the journal minus a torn tail
+        self.load()
+
+    def _file_stamp(self):
+        stamp = []
+        for p in (self.path, self.journal_path):
+            try:
+                st = os.stat(p) if p else None
+                stamp.append((st.st_mtime_ns, st.st_size) if st else None)
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def load(self):
+        with self.lock:
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                data = dict(DEFAULT_PRESETS)
+            except ValueError as e:
+                print(f"[Warning] {self.path} unreadable ({e}), using defaults")
+                data = dict(DEFAULT_PRESETS)
+
+            count = 0
+            good = None
+            if self.journal_path and os.path.exists(self.journal_path):
+                good = 0
+                with open(self.journal_path, "rb") as f:
+                    for line in f:
+                        # Every op is written with its newline in one go, so a
+                        # line without one never finished saving.
+                        if not line.endswith(b"\n"):
+                            break
+                        try:
+                            self._apply_op(data, json.loads(line))
+                        except ValueError:
+                            break
+                        count += 1
+                        good += len(line)
+                    if f.seek(0, os.SEEK_END) == good:
+                        good = None
+                    else:
+                        print(f"[Warning] Skipping torn tail of {self.journal_path}")
+            self.presets = data
+            self._journal_len = count
+            self._journal_good = good
+            self._stamp = self._file_stamp()
+
+    def refresh(self):
+        """Reload if the file or journal changed behind our back; True if it did."""
+        if self._file_stamp() == self._stamp:
+            return False
+        self.load()
+        return True
+
+    def names(self):
+        self.refresh()
+        return sorted(self.presets)
+
+    def get(self, name, default=None):
+        self.refresh()
+        return self.presets.get(name, default)
+
+    def save(self, name, preset):
+        self._commit({"op": "set", "name": name, "preset": dict(preset)})
+
+    def delete(self, name):
+        self._commit({"op": "del", "name": name})
+
+    @staticmethod
+    def _apply_op(data, op):
+        if op.get("op") == "set":
+            data[op["name"]] = op["preset"]
+        elif op.get("op") == "del":
+            data.pop(op["name"], None)
+
+    def _commit(self, op):
+        with self.lock:
+            self.refresh()
+            self._apply_op(self.presets, op)
+            if self.journal_path is None:
+                self.compact()
+                return
+            if self._journal_good is not None:
+                # Only the writer repairs the journal, so readers never race it.
+                try:
+                    with open(self.journal_path, "r+b") as f:
+                        f.truncate(self._journal_good)
+                except FileNotFoundError:
+                    pass
+                self._journal_good = None
+            with open(self.journal_path, "a") as f:
+                f.write(json.dumps(op) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_len += 1
+            if self._journal_len >= self.compact_every:
+                self.compact()
+            else:
+                self._stamp = self._file_stamp()
+
+    def compact(self):
+        """Atomically rewrite presets.json from memory and drop the journal."""
+        with self.lock:
+            fd, tmp = tempfile.mkstemp(prefix=".presets-", suffix=".tmp",
+                                       dir=os.path.dirname(os.path.abspath(self.path)))
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(self.presets, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            except Exception:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                raise
+            # Replaying a leftover journal on top is harmless: ops are idempotent.
+            if self.journal_path and os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._journal_len = 0
+            self._stamp = self._file_stamp()
+
+
+def resolve_preset(presets, name):
+    """Look `name` up in a PresetStore (or None), then the defaults, then Pad."""
+    preset = presets.get(name) if presets is not None else None
+    return preset or DEFAULT_PRESETS.get(name) or DEFAULT_PRESETS["Pad"]
+
+
+# ---------------- Instrumentation ----------------
+class MemorySink:
+    """Keeps every event in a list; for tests and the benchmark."""
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+
+    def clear(self):
+        self.events = []
+
+
+class LogFileSink:
+    """Appends one JSON line per event; safe to share between processes."""
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def emit(self, event):
+        line = json.dumps(event) + "\n"
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+
+class StageTimer:
+    """Times consecutive stages of straight-line code: each lap() closes one span."""
+    def __init__(self, instrument, fields):
+        self.instrument = instrument
+        self.fields = fields
+        self.t = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.instrument.emit_span(name, now - self.t, self.fields)
+        self.t = now
+
+
+class Instrumentation:
+    """Timed spans and counters for renders, fanned out to pluggable sinks.
+
+    Spans are emitted as they close. Counters are cheap increments (they are
+    bumped from pyo callbacks) and go out as one event per flush().
+    """
+    def __init__(self, sinks=None):
+        self.sinks = list(sinks or [])
+        self.counters = {}
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def _emit(self, event):
+        event["t"] = time.time()
+        event["pid"] = os.getpid()
+        for sink in self.sinks:
+            try:
+                sink.emit(event)
+            except Exception as e:
+                print(f"[Debug] instrumentation sink failed: {e}")
+
+    def emit_span(self, name, seconds, fields=None):
+        self._emit(dict(fields or {}, type="span", name=name, seconds=seconds))
+
+    @contextmanager
+    def span(self, name, **fields):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.emit_span(name, time.perf_counter() - start, fields)
+
+    def stages(self, **fields):
+        return StageTimer(self, fields)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def flush(self, **fields):
+        counters, self.counters = self.counters, {}
+        if counters:
+            self._emit(dict(fields, type="counters", values=counters))
+
+
+# ---------------- Render Cache ----------------
+def render_cache_key(plan, preset, gb_mode, reverb_amount, delay_amount, bitcrush_amount,
+                     drums_on, fileformat, engine="pyo"):
+    params = dict(code=plan["digits"], scale=plan["scale_name"], tempo=plan["tempo"],
+                  length=plan["length"], gb=bool(gb_mode), preset=preset, rev=reverb_amount,
+                  dly=delay_amount, bit=bitcrush_amount, drums=bool(drums_on), fmt=fileformat)
+    if engine != "pyo":
+        # "engine" itself is taken by ENGINE_VERSION in RenderCache.key.
+        params["renderer"] = engine
+    return RenderCache.key(**params)
+
+
+def stem_cache_key(plan, preset, drums_on):
+    """Key for the dry stems of a render: everything except the FX chain and format."""
+    return RenderCache.key(stems=True, code=plan["digits"], scale=plan["scale_name"],
+                           tempo=plan["tempo"], length=plan["length"], preset=preset,
+                           drums=bool(drums_on))
+
+
+class RenderCache:
+    """Content-addressed store of finished WAVs with size-bounded LRU eviction.
+
+    Entries are keyed by a hash of every render parameter plus ENGINE_VERSION.
+    The dry stems a render was mixed from are kept alongside under their own
+    key and evicted the same way.
+    Hits bump the file's mtime, which is what eviction orders by. Writes go
+    through a temp file and os.replace, so worker processes can share a cache.
+    """
+    def __init__(self, root=RENDER_CACHE_DIR, max_bytes=RENDER_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(**params):
+        blob = json.dumps(dict(params, engine=ENGINE_VERSION), sort_keys=True)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key + ".wav")
+
+    def fetch(self, key, dest):
+        """Copy a cached render to `dest`; return False on a miss."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+            if os.path.abspath(dest) != os.path.abspath(path):
+                shutil.copyfile(path, dest)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def stem_paths(self, key, drums_on=True):
+        """Cache paths of the dry stems under `key`: stereo voices, mono drums."""
+        base = os.path.join(self.root, key[:2], key)
+        names = STEM_NAMES if drums_on else STEM_NAMES[:1]
+        return {name: f"{base}.{name}.wav" for name in names}
+
+    def fetch_stems(self, key, drums_on=True):
+        """Stem paths when every stem is cached, else None."""
+        paths = self.stem_paths(key, drums_on)
+        try:
+            for path in paths.values():
+                os.utime(path)
+        except FileNotFoundError:
+            return None
+        return paths
+
+    def store_stems(self, recorded):
+        """Move finished stem recordings ({tmp: cache path}) into the cache."""
+        for tmp, path in recorded.items():
+            try:
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"[Warning] Could not cache stem {path}: {e}")
+        self.evict()
+
+    def store(self, key, src):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"[Warning] Could not cache {src}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(".wav"):
+                    continue
+                full = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(full)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full))
+                total += st.st_size
+        entries.sort()
+        for _, size, full in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(full)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+
+# ---------------- Streaming Export ----------------
+# pyo recordOptions fileformat codes
+FILEFORMATS = {".wav": 0, ".aif": 1, ".aiff": 1, ".flac": 5}
+
+
+def record_fileformat(path):
+    return FILEFORMATS.get(os.path.splitext(path)[1].lower(), 0)
+
+
+class ChunkedWavWriter:
+    """Write audio block by block to a path or a writable binary stream.
+
+    Memory use is one block regardless of track length. Seekable targets get
+    the real sizes patched into the header on close; pipes and sockets keep
+    the 0xFFFFFFFF "unknown length" sizes streaming readers expect. FLAC
+    needs the optional soundfile module.
+    """
+    def __init__(self, target, sr=OFFLINE_SR, nchnls=2, fmt="wav", sampletype="int16"):
+        self.sr = sr
+        self.nchnls = nchnls
+        self.fmt = fmt
+        self.sampletype = sampletype
+        self.frames = 0
+        self._own = isinstance(target, str)
+        self._sf = None
+        self._out = None
+        if fmt == "flac":
+            if not HAS_SOUNDFILE:
+                raise RuntimeError("FLAC export needs the soundfile module")
+            self._sf = soundfile.SoundFile(target, "w", samplerate=sr, channels=nchnls,
+                                           format="FLAC", subtype="PCM_16")
+        else:
+            self._out = open(target, "wb") if self._own else target
+            self._write_header(0xFFFFFFFF)
+
+    def _write_header(self, data_bytes):
+        width = 2 if self.sampletype == "int16" else 4
+        tag = 1 if self.sampletype == "int16" else 3
+        riff = 0xFFFFFFFF if data_bytes == 0xFFFFFFFF else 36 + data_bytes
+        self._out.write(b"RIFF" + struct.pack("<I", riff) + b"WAVE")
+        self._out.write(b"fmt " + struct.pack("<IHHIIHH", 16, tag, self.nchnls, self.sr,
+                                              self.sr * self.nchnls * width,
+                                              self.nchnls * width, width * 8))
+        self._out.write(b"data" + struct.pack("<I", data_bytes))
+
+    def write(self, channels):
+        """Append one block given as one sample sequence per channel."""
+        n = len(channels[0])
+        data = array('f', [0.0]) * (n * self.nchnls)
+        for c in range(self.nchnls):
+            data[c::self.nchnls] = array('f', channels[c])
+        if self.sampletype == "int16" or self._sf is not None:
+            # Clip and convert in Python; float32 output skips this per-sample cost.
+            data = array('h', [int(max(-1.0, min(1.0, x)) * 32767) for x in data])
+        if sys.byteorder == "big":
+            data.byteswap()
+        if self._sf is not None:
+            self._sf.buffer_write(data.tobytes(), dtype="int16")
+        else:
+            self._out.write(data.tobytes())
+        self.frames += n
+
+    def write_array(self, block):
+        """Append a (channels, frames) NumPy float block without per-sample Python."""
+        frames = np.ascontiguousarray(np.asarray(block).T)
+        if self.sampletype == "int16" or self._sf is not None:
+            data = (np.clip(frames, -1.0, 1.0) * 32767).astype("<i2")
+        else:
+            data = frames.astype("<f4")
+        if self._sf is not None:
+            self._sf.buffer_write(data.tobytes(), dtype="int16")
+        else:
+            self._out.write(data.tobytes())
+        self.frames += frames.shape[0]
+
+    def close(self):
+        if self._sf is not None:
+            self._sf.close()
+            return
+        try:
+            seekable = self._out.seekable()
+        except Exception:
+            seekable = False
+        if seekable:
+            width = 2 if self.sampletype == "int16" else 4
+            end = self._out.tell()
+            self._out.seek(0)
+            self._write_header(self.frames * self.nchnls * width)
+            self._out.seek(end)
+        self._out.flush()
+        if self._own:
+            self._out.close()
+
+
+def clear_server_callback(server):
+    """Remove a per-buffer callback. pyo ignores setCallback(None), so install a no-op."""
+    server.setCallback(_no_callback)
+
+
+def _no_callback():
+    pass
+
+
+class BlockTap:
+    """Pull rendered audio from an offline server one buffer at a time.
+
+    TableFill keeps a DataTable of exactly one server buffer filled, so when
+    the server callback fires at the start of a buffer the table holds the
+    block computed just before; that block goes straight to the writer.
+    """
+    def __init__(self, server, source, writer, buffersize=OFFLINE_BUFFERSIZE):
+        self.server = server
+        self.writer = writer
+        self.table = pyo.DataTable(size=buffersize, chnls=writer.nchnls)
+        self.fill = pyo.TableFill(source, self.table)
+        self.primed = False
+        server.setCallback(self.pull)
+
+    def pull(self):
+        if self.primed:
+            nchnls = self.writer.nchnls
+            if HAS_NUMPY:
+                self.writer.write_array([np.asarray(self.table.getBuffer(c)) for c in range(nchnls)])
+            else:
+                # getTable() alone returns only the first channel, flattened.
+                block = self.table.getTable(all=True)
+                self.writer.write(block if nchnls > 1 else [block])
+        self.primed = True
+
+    def finish(self):
+        # The last computed buffer never sees another callback.
+        self.pull()
+        clear_server_callback(self.server)
+        self.fill.stop()
+        self.writer.close()
+
+
+# ---------------- Drum Sample Bank ----------------
+DRUM_BANK_DIR = os.path.join(script_dir, "drum_bank")
+# Bump when the hit recipes below change so stale bank files are rebuilt.
+DRUM_BANK_VERSION = 2
+# name: (attack, decay, env mul, source, source mul, filter, cutoff, q)
+DRUM_HITS = {
+    "kick": (0.001, 0.03, 0.9, "sine", 0.8, "lp", 120, 1.0),
+    "snare": (0.001, 0.02, 0.7, "noise", 0.6, "bp", 1800, 0.6),
+    "hat": (0.001, 0.01, 0.4, "noise", 0.3, "hp", 6000, 1.0),
+}
+# Time left after the envelope closes for the filter to ring out.
+DRUM_RING = 0.02
+
+
+def butterworth(kind, freq, sr, q=1.0):
+    """Biquad coefficients (b0, b1, b2, a1, a2) of pyo's ButLP/ButHP/ButBP."""
+    sqrt2 = 2 ** 0.5
+    if kind == "lp":
+        c = 1.0 / math.tan(math.pi * freq / sr)
+        b0 = 1.0 / (1.0 + sqrt2 * c + c * c)
+        return b0, 2.0 * b0, b0, 2.0 * b0 * (1.0 - c * c), b0 * (1.0 - sqrt2 * c + c * c)
+    if kind == "hp":
+        c = math.tan(math.pi * freq / sr)
+        b0 = 1.0 / (1.0 + sqrt2 * c + c * c)
+        return b0, -2.0 * b0, b0, 2.0 * b0 * (c * c - 1.0), b0 * (1.0 - sqrt2 * c + c * c)
+    c = 1.0 / math.tan(math.pi * (freq / q) / sr)
+    d = 2.0 * math.cos(2.0 * math.pi * freq / sr)
+    b0 = 1.0 / (1.0 + c)
+    return b0, 0.0, -b0, -c * d * b0, (c - 1.0) * b0
+
+
+def biquad(x, coeffs):
+    """Run a biquad sample by sample; only used on short, precomputed buffers."""
+    b0, b1, b2, a1, a2 = coeffs
+    out = array('f', bytes(4 * len(x)))
+    x1 = x2 = y1 = y2 = 0.0
+    for i, v in enumerate(x):
+        y = b0 * v + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2
+        x2, x1, y2, y1 = x1, v, y1, y
+        out[i] = y
+    return out
+
+
+def synth_drum_hit(name, sr, rng):
+    """Render one hit of the old live kick/snare/hat graphs (Adsr into a Butterworth)."""
+    attack, decay, env_mul, source, src_mul, kind, cutoff, q = DRUM_HITS[name]
+    n = int((attack + decay) * sr) + 1
+    sig = []
+    for i in range(n):
+        t = i / sr
+        env = t / attack if t < attack else max(0.0, 1.0 - (t - attack) / decay)
+        if source == "sine":
+            s = math.sin(2.0 * math.pi * 60 * t)
+        else:
+            s = rng.uniform(-1.0, 1.0)
+        sig.append(s * src_mul * env * env_mul)
+    sig += [0.0] * int(DRUM_RING * sr)
+    return biquad(sig, butterworth(kind, cutoff, sr, q))
+
+
+class DrumBank:
+    """Kick, snare and hat one-shots rendered once per sample rate.
+
+    Hits are kept as mono float32 WAVs under `root`, so a process only
+    synthesizes them the first time a rate is used. pyo loads the same files
+    into SndTables, and NumpyRenderer reads `samples`.
+    """
+    def __init__(self, sr=OFFLINE_SR, root=DRUM_BANK_DIR):
+        self.sr = int(sr)
+        self.root = root
+        self.samples = {}
+        for name in DRUM_HITS:
+            path = self.path(name)
+            if os.path.exists(path):
+                try:
+                    self.samples[name] = self._read(path)
+                    continue
+                except (OSError, ValueError) as e:
+                    print(f"[Warning] Rebuilding drum sample {path}: {e}")
+            # Seeded per hit, so rebuilding one file matches a full build.
+            self.samples[name] = synth_drum_hit(name, self.sr, random.Random(name))
+            self._write(path, self.samples[name])
+
+    def path(self, name):
+        return os.path.join(self.root, f"{name}_{self.sr}_v{DRUM_BANK_VERSION}.wav")
+
+    def duration(self, name):
+        return len(self.samples[name]) / self.sr
+
+    def _write(self, path, samples):
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".wav.tmp")
+            with os.fdopen(fd, "wb") as f:
+                writer = ChunkedWavWriter(f, sr=self.sr, nchnls=1, sampletype="float32")
+                writer.write([samples])
+                writer.close()
+            os.replace(tmp, path)
+        except OSError as e:
+            # Read-only install: keep the in-memory hit and synthesize again next run.
+            print(f"[Warning] Could not cache drum sample {path}: {e}")
+
+    @staticmethod
+    def _read(path):
+        with open(path, "rb") as f:
+            data = f.read()
+        pos = data.find(b"data", 36)
+        if data[:4] != b"RIFF" or pos < 0:
+            raise ValueError("not a bank WAV")
+        size = struct.unpack("<I", data[pos + 4:pos + 8])[0]
+        samples = array('f')
+        samples.frombytes(data[pos + 8:pos + 8 + size])
+        if sys.byteorder == "big":
+            samples.byteswap()
+        return samples
+
+
+_DRUM_BANKS = {}
+
+
+def drum_bank(sr=OFFLINE_SR):
+    """Process-wide DrumBank for `sr`."""
+    sr = int(sr)
+    if sr not in _DRUM_BANKS:
+        _DRUM_BANKS[sr] = DrumBank(sr)
+    return _DRUM_BANKS[sr]
+
+
+# ---------------- Wavetable Bank ----------------
+WAVETABLE_DIR = os.path.join(script_dir, "wavetables")
+WAVETABLE_BANK_VERSION = 1
+WAVETABLE_SIZE = 8192
+# SquareTable/SawTable default harmonic count
+WAVETABLE_ORDER = 10
+# Octave k holds tables safe for fundamentals up to WAVETABLE_BASE_HZ * 2**(k+1).
+WAVETABLE_BASE_HZ = 32.703  # C1
+WAVETABLE_OCTAVES = 10
+# Bank rows per wave type; wave type 3 plays the sine like before.
+WAVE_ROWS = {0: 0, 1: 1, 2: 2, 3: 0}
+
+
+def build_wavetable_bank(sr):
+    """(3, WAVETABLE_OCTAVES, WAVETABLE_SIZE + 1) float32 sine/square/saw tables.
+
+    Each octave keeps the SquareTable/SawTable recipe of WAVETABLE_ORDER
+    harmonics at 1/k amplitude, minus any harmonic that would pass Nyquist
+    at the top of the octave. Tables are peak-normalized and repeat their
+    first sample at the end for interpolation.
+    """
+    x = np.arange(WAVETABLE_SIZE + 1) * (2.0 * np.pi / WAVETABLE_SIZE)
+    bank = np.zeros((3, WAVETABLE_OCTAVES, WAVETABLE_SIZE + 1), dtype=np.float32)
+    for octave in range(WAVETABLE_OCTAVES):
+        top = WAVETABLE_BASE_HZ * 2 ** (octave + 1)
+        limit = max(1, min(WAVETABLE_ORDER, int(sr / 2 / top)))
+        for row, step in ((0, None), (1, 2), (2, 1)):
+            harmonics = [1] if step is None else range(1, limit + 1, step)
+            table = sum(np.sin(k * x) / k for k in harmonics)
+            bank[row, octave] = table / np.abs(table).max()
+    return bank
+
+
+def wavetable_octave(freq):
+    """Bank octave whose tables are alias-free up to `freq`."""
+    if freq <= WAVETABLE_BASE_HZ:
+        return 0
+    return min(int(math.log2(freq / WAVETABLE_BASE_HZ)), WAVETABLE_OCTAVES - 1)
+
+
+_WAVETABLE_BANKS = {}
+
+
+def wavetable_bank(sr=OFFLINE_SR):
+    """The bank for `sr`, memory-mapped read-only from WAVETABLE_DIR.
+
+    The first process to need a rate writes the .npy file (temp file plus
+    os.replace). Every process after that maps the same file, so a worker
+    pool shares one copy of the tables through the page cache.
+    """
+    sr = int(sr)
+    if sr in _WAVETABLE_BANKS:
+        return _WAVETABLE_BANKS[sr]
+    path = os.path.join(WAVETABLE_DIR, f"wavetables_{sr}_v{WAVETABLE_BANK_VERSION}.npy")
+    bank = None
+    if os.path.exists(path):
+        try:
+            bank = np.load(path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            print(f"[Warning] Rebuilding wavetable bank {path}: {e}")
+    if bank is None:
+        bank = build_wavetable_bank(sr)
+        try:
+            os.makedirs(WAVETABLE_DIR, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=WAVETABLE_DIR, suffix=".npy.tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, bank)
+            os.replace(tmp, path)
+            bank = np.load(path, mmap_mode="r")
+        except OSError as e:
+            # Read-only install: use the in-memory bank for this process.
+            print(f"[Warning] Could not cache wavetable bank {path}: {e}")
+    _WAVETABLE_BANKS[sr] = bank
+    return bank
+
+
+def wavetable_row(wave_type, freq, sr=OFFLINE_SR):
+    """Read-only table (with guard point) for a voice whose highest note is `freq`."""
+    return wavetable_bank(sr)[WAVE_ROWS.get(wave_type, 0), wavetable_octave(freq)]
+
+
+def pyo_wavetable(wave_type, freq, sr):
+    """pyo table for a voice whose highest note is `freq`.
+
+    Copies one bank row into a DataTable instead of summing harmonics per
+    render. Without numpy it falls back to pyo's own generated tables.
+    """
+    if not HAS_NUMPY:
+        if wave_type == 1:
+            return pyo.SquareTable()
+        if wave_type == 2:
+            return pyo.SawTable()
+        return pyo.SineTable()
+    row = wavetable_row(wave_type, freq, sr)[:WAVETABLE_SIZE]
+    table = pyo.DataTable(size=WAVETABLE_SIZE)
+    try:
+        np.asarray(table.getBuffer())[:] = row
+    except Exception:
+        table.replace(row.tolist())
+    return table
+
+
+# ---------------- Render Jobs ----------------
+# Seconds the master fades out for when a live render ends or is stopped.
+STOP_FADE = 0.5
+
+
+class RenderCancelled(Exception):
+    """A render stopped early because its RenderJob was cancelled."""
+
+
+def partial_path(path):
+    """Where a render writes before it is renamed to `path` on success."""
+    base, ext = os.path.splitext(path)
+    return f"{base}.partial{ext}"
+
+
+def publish_partial(path, keep=True):
+    """Rename a finished partial file into place, or remove it."""
+    partial = partial_path(path)
+    try:
+        if keep:
+            os.replace(partial, path)
+        elif os.path.exists(partial):
+            os.remove(partial)
+    except OSError as e:
+        print(f"[Warning] Could not finalize {path}: {e}")
+
+
+class RenderJob:
+    """Cancel token plus completion future for one render.
+
+    cancel() never blocks. It sets the flag and runs the hooks the engine
+    registered, which start the fade-out and teardown on their own threads.
+    `future` resolves with the export path once the file is in place. It
+    is cancelled instead once teardown has removed the partial file.
+    `event` can be a multiprocessing.Event, so one flag cancels jobs in
+    every worker process.
+    """
+    def __init__(self, code=None, export_file=None, event=None):
+        self.code = code
+        self.export_file = export_file
+        self.future = Future()
+        self._event = event if event is not None else threading.Event()
+        self._lock = threading.Lock()
+        self._hooks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """Request cancellation; False if the job has already finished."""
+        if self.future.done():
+            return False
+        self._event.set()
+        self._run_hooks()
+        return True
+
+    def on_cancel(self, fn):
+        """Call `fn` once when the job is cancelled, right away if it already is."""
+        with self._lock:
+            self._hooks.append(fn)
+        if self.cancelled:
+            self._run_hooks()
+
+    def _run_hooks(self):
+        with self._lock:
+            hooks, self._hooks = self._hooks, []
+        for fn in hooks:
+            try:
+                fn()
+            except Exception as e:
+                print(f"[Debug] cancel hook: {e}")
+
+    def check(self):
+        if self.cancelled:
+            raise RenderCancelled(f"render of {self.code} cancelled")
+
+    def finish(self, result=None, error=None):
+        """Resolve the future; a cancelled job resolves as cancelled."""
+        if self.future.done():
+            return
+        if self.cancelled:
+            self.future.cancel()
+        elif error is not None:
+            self.future.set_exception(error)
+        else:
+            self.future.set_result(result)
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+
+# ---------------- Audio Profile ----------------
+AUDIO_PROFILE_FILE = os.path.join(script_dir, "audio_profile.json")
+AUDIO_PROFILE_VERSION = 1
+PROBE_RATES = (44100, 48000)
+PROBE_BUFFERSIZES = (64, 128, 256, 512, 1024, 2048)
+PROBE_SECONDS = 1.0
+# Highest share of late or missing buffer callbacks a config may have and count as stable.
+PROBE_MAX_UNDERRUNS = 0.01
+PROBE_TIMEOUT = 90
+# Buffer-size steps the live profile keeps above the smallest stable one. The
+# probe plays a silent Sine; real playback adds the full FX chain and the
+# output monitor callback.
+PROBE_HEADROOM = 1
+
+
+def _audio_host():
+    """What a cached profile is valid for: this machine and its default output."""
+    import platform
+    try:
+        device = int(pyo.pa_get_default_output())
+    except Exception:
+        device = None
+    return {"node": platform.node(), "output": device}
+
+
+def probe_server_config(sr, buffersize, seconds=PROBE_SECONDS):
+    """Run a live server with this config and time its buffer callbacks.
+
+    Underruns are callbacks that arrived more than two periods after the
+    previous one, plus any callbacks that never arrived. Round-trip latency
+    is estimated as one input and one output buffer plus the worst
+    callback jitter seen.
+    """
+    server = pyo.Server(sr=sr, nchnls=2, buffersize=buffersize, duplex=0)
+    server.boot()
+    stamps = []
+    server.setCallback(lambda: stamps.append(time.perf_counter()))
+    # A quiet but real graph, so the callback carries some DSP.
+    load = pyo.Sine(freq=[220, 330], mul=0).out()
+    server.start()
+    time.sleep(seconds)
+    server.stop()
+    clear_server_callback(server)
+    load.stop()
+    server.shutdown()
+
+    period = buffersize / sr
+    gaps = [b - a for a, b in zip(stamps, stamps[1:])]
+    late = sum(1 for gap in gaps if gap > 2 * period)
+    missing = max(0.0, 1.0 - len(stamps) / (seconds / period))
+    jitter = max(gaps) - period if gaps else 0.0
+    underruns = max(late / len(gaps), missing) if gaps else 1.0
+    return {"sr": sr, "buffersize": buffersize, "callbacks": len(stamps),
+            "underrun_rate": round(underruns, 4),
+            "latency_ms": round(1000 * (2 * period + max(0.0, jitter)), 2),
+            "stable": bool(gaps) and underruns <= PROBE_MAX_UNDERRUNS}
+
+
+def probe_audio(rates=PROBE_RATES, buffersizes=PROBE_BUFFERSIZES, seconds=PROBE_SECONDS):
+    """Probe the host and pick the low-latency "live" profile for live servers.
+
+    Per rate, buffer sizes go up from the smallest until one is stable.
+    "live" is the stable config with the lowest latency, moved up
+    PROBE_HEADROOM buffer sizes, or None when nothing was stable. Exports
+    render on offline servers, which need no profile.
+    """
+    results = []
+    for sr in rates:
+        for buffersize in buffersizes:
+            try:
+                result = probe_server_config(sr, buffersize, seconds)
+            except Exception as e:
+                result = {"sr": sr, "buffersize": buffersize, "stable": False, "error": str(e)}
+            print(f"[Info] Probe sr={sr} buffersize={buffersize}: "
+                  f"{result.get('latency_ms')} ms, underruns {result.get('underrun_rate')}")
+            results.append(result)
+            if result["stable"]:
+                break
+
+    stable = [r for r in results if r["stable"]]
+    profiles = {"live": None}
+    if stable:
+        live = min(stable, key=lambda r: (r["latency_ms"], r["underrun_rate"]))
+        step = buffersizes.index(live["buffersize"]) + PROBE_HEADROOM
+        profiles["live"] = {"sr": live["sr"], "buffersize": buffersizes[min(step, len(buffersizes) - 1)]}
+    return {"version": AUDIO_PROFILE_VERSION, "host": _audio_host(), "probed_at": time.time(),
+            "profiles": profiles, "results": results}
+
+
+def save_audio_profile(report, path=AUDIO_PROFILE_FILE):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, path)
+
+
+def read_audio_profile(path=AUDIO_PROFILE_FILE):
+    """The cached probe report, or None if missing, stale or from another host."""
+    try:
+        with open(path, "r") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if report.get("version") != AUDIO_PROFILE_VERSION or report.get("host") != _audio_host():
+        return None
+    return report
+
+
+def load_audio_profile(name="live", path=AUDIO_PROFILE_FILE):
+    """Server kwargs of cached profile `name`, or None."""
+    report = read_audio_profile(path)
+    return (report.get("profiles") or {}).get(name) if report else None
+
+
+def ensure_audio_profile(name="live", path=AUDIO_PROFILE_FILE):
+    """Cached profile `name`, probing first in a child process if this host has none.
+
+    The probe boots several servers one after another, so it gets its own
+    process, away from this one's server and any driver crash it may cause.
+    A probe that found nothing stable is cached too and not repeated.
+    """
+    report = read_audio_profile(path)
+    if report is None:
+        import subprocess
+        cmd = [sys.executable] if getattr(sys, "frozen", False) else [sys.executable, os.path.abspath(__file__)]
+        print("[Info] Probing audio latency (first run on this host)...")
+        try:
+            subprocess.run(cmd + ["probe", "--output", path], timeout=PROBE_TIMEOUT,
+                           stdout=subprocess.DEVNULL)
+        except Exception as e:
+            print(f"[Warning] Audio probe failed: {e}")
+            return None
+        report = read_audio_profile(path)
+    return (report.get("profiles") or {}).get(name) if report else None
+
+
+# ---------------- Output Monitor ----------------
+# About 1.5 s of stereo output at 44.1 kHz.
+MONITOR_FRAMES = 65536
+MONITOR_FPS = 20
+MONITOR_WINDOW = 2048
+MONITOR_BANDS = 48
+# Header slots (int64): frames written so far, sample rate, channels, ring frames, owner pid
+MONITOR_HEADER = 5
+
+
+class MonitorRing:
+    """Single-writer, lock-free ring of recent output frames in shared memory.
+
+    The audio thread copies each buffer in and then bumps the frame counter.
+    Readers in this or any other process copy the newest frames and re-read
+    the counter. If the writer lapped them during the copy, the read is
+    retried. Neither side ever blocks the other.
+    """
+    def __init__(self, name=None, sr=OFFLINE_SR, nchnls=2, frames=MONITOR_FRAMES):
+        from multiprocessing import shared_memory
+        self.owner = name is None
+        if self.owner:
+            size = 8 * MONITOR_HEADER + 4 * nchnls * frames
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            atexit.register(self.close)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.header = np.ndarray((MONITOR_HEADER,), dtype=np.int64, buffer=self.shm.buf)
+        if self.owner:
+            self.header[:] = (0, sr, nchnls, frames, os.getpid())
+        elif int(self.header[4]) != os.getpid():
+            try:
+                # Attaching registered the block for unlink at our exit;
+                # only the owner may do that.
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception:
+                pass
+        self.nchnls, self.frames = int(self.header[2]), int(self.header[3])
+        self.data = np.ndarray((self.frames, self.nchnls), dtype=np.float32,
+                               buffer=self.shm.buf, offset=8 * MONITOR_HEADER)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def sr(self):
+        return int(self.header[1])
+
+    @property
+    def written(self):
+        return int(self.header[0])
+
+    def write(self, channels):
+        """Append one block given as one sample sequence per channel."""
+        block = np.asarray(channels, dtype=np.float32).T
+        n = min(len(block), self.frames)
+        block = block[-n:]
+        start = self.written % self.frames
+        head = min(n, self.frames - start)
+        self.data[start:start + head] = block[:head]
+        self.data[:n - head] = block[head:]
+        self.header[0] += n
+
+    def latest(self, n=MONITOR_WINDOW, retries=3):
+        """(channels, n) copy of the newest frames, or None before n frames exist."""
+        n = min(n, self.frames)
+        for _ in range(retries):
+            end = self.written
+            if end < n:
+                return None
+            idx = np.arange(end - n, end) % self.frames
+            block = self.data[idx].T.copy()
+            if self.written - (end - n) <= self.frames:
+                return block
+        return None
+
+    def close(self):
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except Exception:
+            pass
+
+
+class MonitorTap:
+    """Copy each buffer of a live server's output into a MonitorRing.
+
+    Works like BlockTap: TableFill keeps one server buffer in a DataTable,
+    and the server callback hands that block to the ring. The cost on the
+    audio thread is one small array copy per buffer.
+    """
+    def __init__(self, server, source, ring, buffersize):
+        self.server = server
+        self.ring = ring
+        self.table = pyo.DataTable(size=buffersize, chnls=ring.nchnls)
+        self.fill = pyo.TableFill(source, self.table)
+        ring.header[1] = int(server.getSamplingRate())
+        server.setCallback(self.pull)
+
+    def pull(self):
+        try:
+            self.ring.write([np.asarray(self.table.getBuffer(c)) for c in range(self.ring.nchnls)])
+        except Exception:
+            # Never raise on the audio thread.
+            pass
+
+    def finish(self):
+        clear_server_callback(self.server)
+        self.fill.stop()
+
+
+def monitor_levels(block):
+    """Peak and RMS per channel in dBFS."""
+    floor = 1e-9
+    peak = np.abs(block).max(axis=1)
+    rms = np.sqrt(np.mean(np.square(block), axis=1))
+    return 20 * np.log10(np.maximum(peak, floor)), 20 * np.log10(np.maximum(rms, floor))
+
+
+def monitor_spectrum(block, sr, bands=MONITOR_BANDS, low=30.0):
+    """Mid-channel magnitude spectrum in dB, max-pooled into log-spaced bands."""
+    mid = block.mean(axis=0)
+    mag = np.abs(np.fft.rfft(mid * np.hanning(len(mid)))) * (4.0 / len(mid))
+    edges = np.geomspace(low, sr / 2, bands + 1) * len(mid) / sr
+    edges = np.clip(edges.astype(int), 1, len(mag) - 1)
+    pooled = np.array([mag[a:max(a + 1, b)].max() for a, b in zip(edges[:-1], edges[1:])])
+    return 20 * np.log10(np.maximum(pooled, 1e-9))
+
+
+def monitor_scope(block, width):
+    """Mid-channel (min, max) per pixel column, for drawing the waveform."""
+    mid = block.mean(axis=0)
+    cols = mid[:len(mid) // width * width].reshape(width, -1)
+    return cols.min(axis=1), cols.max(axis=1)
+
+
+class ScopeWindow:
+    """Tk window with waveform, level meters and spectrum of the live output.
+
+    It polls the engine's MonitorRing at most `fps` times per second, on the
+    Tk thread. It only moves existing canvas items, so drawing a frame
+    costs about the same as reading it.
+    """
+    def __init__(self, master, get_ring, fps=MONITOR_FPS, width=520, height=300):
+        self.get_ring = get_ring
+        self.interval = max(1, int(1000 / fps))
+        self.width, self.height = width, height
+        self.top = tk.Toplevel(master)
+        self.top.title("Scope")
+        self.canvas = tk.Canvas(self.top, width=width, height=height, background="black")
+        self.canvas.pack(fill="both", expand=True)
+        self.wave_h = height // 2
+        c = self.canvas
+        self.wave = c.create_line(0, 0, 0, 0, fill="#6f6")
+        self.spec = c.create_line(0, 0, 0, 0, fill="#6cf")
+        self.meters = [(c.create_rectangle(0, 0, 0, 0, fill="#2a2", outline=""),
+                        c.create_rectangle(0, 0, 0, 0, outline="#ff4")) for _ in range(2)]
+        self.label = c.create_text(6, 6, anchor="nw", fill="#aaa", text="waiting for audio")
+        self.last = -1
+        self.refresh()
+
+    def alive(self):
+        try:
+            return bool(self.top.winfo_exists())
+        except Exception:
+            return False
+
+    def refresh(self):
+        if not self.alive():
+            return
+        ring = self.get_ring()
+        if ring is not None and ring.written != self.last:
+            self.last = ring.written
+            block = ring.latest()
+            if block is not None:
+                self.draw(block, ring.sr)
+        self.top.after(self.interval, self.refresh)
+
+    def draw(self, block, sr):
+        c, w, mid_y = self.canvas, self.width - 40, self.wave_h / 2
+        lo, hi = monitor_scope(block, w // 2)
+        points = []
+        for x, (a, b) in enumerate(zip(lo, hi)):
+            points += [2 * x, mid_y - b * mid_y, 2 * x + 1, mid_y - a * mid_y]
+        c.coords(self.wave, *points)
+
+        spec = monitor_spectrum(block, sr)
+        top, span = self.wave_h, self.height - self.wave_h
+        step = w / (len(spec) - 1)
+        points = []
+        for i, db in enumerate(spec):
+            points += [i * step, top + span * min(1.0, max(0.0, -db / 90.0))]
+        c.coords(self.spec, *points)
+
+        peak, rms = monitor_levels(block)
+
+        def level(db):
+            return self.height * min(1.0, max(0.0, -db / 60.0))
+
+        for ch, (bar, mark) in enumerate(self.meters[:len(peak)]):
+            x = w + 8 + ch * 16
+            c.coords(bar, x, level(rms[ch]), x + 12, self.height)
+            c.coords(mark, x, level(peak[ch]), x + 12, level(peak[ch]) + 1)
+        c.itemconfigure(self.label, text=f"peak {peak.max():.1f} dBFS  rms {rms.max():.1f} dBFS")
+
+
 # ---------------- Synth Engine ----------------
+# SigTo ramp time for live parameter changes; long enough to avoid zipper noise.
+LIVE_RAMP = 0.05
+# Settings set_live() accepts, named as in FullGUI.collect_ui().
+LIVE_KEYS = ("rev", "dly", "bit", "gb", "tempo", "scale")
+
+
+def degrade_params(bitcrush_amount, gb_mode):
+    """(enabled, bitdepth, srscale) of the Degrade stage for these settings."""
+    if gb_mode:
+        return True, 6, 0.125
+    return bitcrush_amount > 0.0, max(1, int(16 - bitcrush_amount * 15)), 1.0 - bitcrush_amount * 0.5
+
+
+def envelope_points(preset, note_dur, size=ENV_TABLE_SIZE):
+    """Lay a preset's ADSR over one note of `note_dur` seconds as LinTable points.
+
+    Attack, decay and release are scaled down together when they do not fit
+    into the note, since a retrigger restarts the envelope.
+    """
+    a = max(float(preset.get("attack", 0.01)), 0.0)
+    d = max(float(preset.get("decay", 0.1)), 0.0)
+    r = max(float(preset.get("release", 0.1)), 0.0)
+    sus = min(max(float(preset.get("sustain", 1.0)), 0.0), 1.0)
+    if a + d + r > note_dur:
+        k = note_dur / (a + d + r)
+        a, d, r = a * k, d * k, r * k
+    last = size - 1
+    points = [(0, 0.0)]
+    for t, v in ((a, 1.0), (a + d, sus), (note_dur - r, sus)):
+        idx = max(int(t / note_dur * last), points[-1][0] + 1)
+        points.append((min(idx, last - 1), v))
+    points.append((last, 0.0))
+    return points
+
+
+class DrumSampler:
+    """Kick/snare/hat played back from a DrumBank off the step clock.
+
+    Each drum is one table, one Iter over its 0/1 step list and one TrigEnv.
+    The TrigEnv fires on clock * step, so all drums stay phase-locked to the
+    voices and no Python runs per hit.
+    """
+    def __init__(self, bank, clock, steps, mul=1):
+        self.objects = []
+        self.outputs = []
+        for name, pattern in zip(DRUM_HITS, steps):
+            path = bank.path(name)
+            if os.path.exists(path):
+                table = pyo.SndTable(path)
+            else:
+                table = pyo.DataTable(size=len(bank.samples[name]), init=list(bank.samples[name]))
+            gate = pyo.Iter(clock, choice=pattern)
+            player = pyo.TrigEnv(clock * gate, table=table, dur=bank.duration(name), mul=mul).out()
+            self.outputs.append(player)
+            self.objects += [table, gate]
+        self.objects += self.outputs
+
+
 class BenSynth:
-    def __init__(self):
+    def __init__(self, background_init=False, cache=None, keep_warm=False, instrument=None,
+                 presets=None, stems=False):
+        # keep_warm: leave the server booted between renders and only switch
+        # its record target, instead of a full boot/shutdown per job.
+        # stems: keep dry voice/drum stems in the cache so FX-only re-exports
+        # skip synthesis. Worth it where FX get tweaked (the GUI), not for
+        # batch jobs, where it would only triple the cache writes.
         self.server = None
+        self.stems = stems
+        self.server_mode = None
+        self.keep_warm = keep_warm
+        self.graph = []
+        self.cache = cache
+        self.last_cache_hit = False
+        self.instrument = instrument or Instrumentation()
+        self.presets = presets
         self.voices = []
         self.oscillators = []
+        # (TrigEnv, LinTable, length in steps) per voice group, for live tempo changes
         self.envs = []
+        # Named SigTo controls of the live graph, and what set_live needs to retune it
+        self.controls = {}
+        self.live = None
         self.effects = []
         self.mix = None
         self.pat = None
         self.mel_pat = None
         self.drum_pat = None
+        self.job = None
         self.is_running = False
         self.server_ready = False
         self.init_thread = None
         self.volume_scales = []
         self.scope = None
         self.spec = None
-        
-        self.start_background_init()
+        # Shared-memory ring of the live output, kept across renders, and the
+        # server-callback tap that feeds it while a live render plays.
+        self.monitor = None
+        self.monitor_tap = None
+        self.drums = None
+
+        if background_init:
+            self.start_background_init()
 
     def start_background_init(self):
         if self.init_thread is None or not self.init_thread.is_alive():
             self.init_thread = threading.Thread(target=self._init_server_background, daemon=True)
             self.init_thread.start()
-    
+
+    def _create_server(self, probe=False):
+        """Create a live Server from the probed profile or the first SERVER_CONFIGS entry that constructs.
+
+        probe=True runs the latency probe first when this host has no cached
+        profile; only the background init does, as it can take a while.
+        """
+        profile = ensure_audio_profile() if probe else load_audio_profile()
+        for cfg in ([profile] if profile else []) + SERVER_CONFIGS:
+            try:
+                server = pyo.Server(**cfg)
+                print(f"[Info] Server object created with cfg={cfg or 'defaults'}")
+                self.server_mode = "live"
+                return server
+            except Exception as e:
+                print(f"[Debug] Server creation attempt failed: {e}")
+        return None
+
     def _init_server_background(self):
         try:
-            try_configs = [
-                {"buffersize": 2048, "sr": 44100},
-                {"buffersize": 1024, "sr": 44100},
-                {"buffersize": 512, "sr": 44100},
-                {},
-            ]
-            
-            for cfg in try_configs:
-                try:
-                    if cfg:
-                        self.server = Server(**cfg)
-                        print(f"[Info] Server object created with cfg={cfg}")
-                    else:
-                        self.server = Server()
-                        print("[Info] Server object created with default settings")
-                    self.server_ready = True
-                    print("[Info] Background server preparation complete")
-                    return
-                except Exception as e:
-                    print(f"[Debug] Server creation attempt failed: {e}")
-                    self.server = None
-            
+            self.server = self._create_server(probe=True)
+            if self.server is not None:
+                self.server_ready = True
+                print("[Info] Background server preparation complete")
+                return
+
             print("[Warning] Could not prepare Server object")
             self.server_ready = False
         except Exception as e:
             print(f"[Warning] Background server prep failed: {e}")
             self.server_ready = False
-    
+
     def wait_for_server(self, timeout=15):
         start_time = time.time()
         while not self.server_ready and (time.time() - start_time) < timeout:
@@ -225,42 +1639,39 @@ class BenSynth:
             pass
 
     def start_server(self, record_file):
+        # The background init may still be probing; let it finish and hand
+        # over its server instead of booting a second one.
+        if self.init_thread is not None and self.init_thread.is_alive():
+            self.init_thread.join()
+
+        if self.server is not None and self.server_mode != "live":
+            self.stop_server()
+
+        if self.keep_warm and self.server is not None and self.server.getIsStarted():
+            # Warm engine: only switch the record target.
+            self.server.recordOptions(filename=record_file, fileformat=0, sampletype=0)
+            self.server.recstart()
+            return
+
         if self.server is not None and not self.server.getIsBooted():
             print("[Info] Using pre-created Server object")
         elif self.server is None:
-            try_configs = [
-                {"buffersize": 2048, "sr": 44100},
-                {"buffersize": 1024, "sr": 44100},
-                {"buffersize": 512, "sr": 44100},
-                {},
-            ]
-            
-            for cfg in try_configs:
-                try:
-                    if cfg:
-                        self.server = Server(**cfg)
-                    else:
-                        self.server = Server()
-                    break
-                except Exception as e:
-                    print(f"[Debug] Server creation failed: {e}")
-                    self.server = None
-            
+            self.server = self._create_server()
             if self.server is None:
                 raise RuntimeError("Server creation failed")
-        
+
         attempts = 3
         for attempt in range(1, attempts + 1):
             try:
                 self.server.recordOptions(filename=record_file, fileformat=0, sampletype=0)
-                
+
                 if not self.server.getIsBooted():
                     self.server.boot()
                     time.sleep(0.15)
 
                 if not self.server.getIsStarted():
                     self.server.start()
-                
+
                 time.sleep(0.1)
                 self.server.recstart()
                 break
@@ -269,196 +1680,1219 @@ class BenSynth:
                 if attempt == attempts:
                     raise
 
+    def start_offline_server(self, record_file, duration, fileformat=0):
+        """Boot a non-realtime server that renders `duration` seconds to `record_file`.
+
+        No audio device is opened. Nothing is computed until `server.start()`,
+        which then blocks and runs as fast as the CPU allows. A warm offline
+        server from the previous render is reused with a new record target.
+        """
+        if self.init_thread is not None and self.init_thread.is_alive():
+            self.init_thread.join()
+
+        if self.keep_warm and self.server_mode == "offline" and self.server.getIsBooted():
+            self.server.recordOptions(dur=duration, filename=record_file,
+                                      fileformat=fileformat, sampletype=0)
+            return
+
+        if self.server is not None:
+            if self.server.getIsBooted():
+                self.stop_server()
+            else:
+                self.server = None
+
+        self.server = pyo.Server(sr=OFFLINE_SR, nchnls=2, buffersize=OFFLINE_BUFFERSIZE,
+                             duplex=0, audio="offline")
+        self.server_mode = "offline"
+        self.server.boot()
+        self.server.recordOptions(dur=duration, filename=record_file,
+                                  fileformat=fileformat, sampletype=0)
+
+    def resolve_preset(self, name):
+        return resolve_preset(self.presets, name)
+
+    def reset_graph(self):
+        """Stop and drop every object of the last render; the server stays booted."""
+        if self.monitor_tap is not None:
+            self.monitor_tap.finish()
+            self.monitor_tap = None
+        for obj in self.graph:
+            try:
+                obj.stop()
+            except Exception:
+                pass
+        self.graph = []
+        self.voices = []
+        self.envs = []
+        self.controls = {}
+        self.live = None
+        self.mix = None
+        self.pat = None
+        self.mel_pat = None
+        self.drum_pat = None
+        self.drums = None
+
+    def release_server(self):
+        """Finish a live render: warm engines stop recording and keep running."""
+        if not self.keep_warm or self.server is None:
+            self.stop_server()
+            return
+        try:
+            self.server.recstop()
+        except Exception as e:
+            print(f"[Debug] recstop: {e}")
+        self.reset_graph()
+
     def stop_server(self):
+        self.reset_graph()
         if self.server is not None:
+            # Offline servers have nothing in flight, so no settle pauses.
+            live = self.server_mode == "live"
             try:
                 self.server.recstop()
             except Exception as e:
                 print(f"[Debug] recstop: {e}")
-            
-            time.sleep(0.1)
-            
+
+            if live:
+                time.sleep(0.1)
+
             try:
                 self.server.stop()
             except Exception as e:
                 print(f"[Debug] stop: {e}")
-            
-            time.sleep(0.05)
-            
+
+            if live:
+                time.sleep(0.05)
+
             try:
                 self.server.shutdown()
             except Exception as e:
                 print(f"[Debug] shutdown: {e}")
             finally:
                 self.server = None
+                self.server_mode = None
+
+    def _abort_render(self, job, offline, export_file, error):
+        """Tear down a render that failed or was cancelled before it finished."""
+        if offline and self.keep_warm and not isinstance(error, RenderCancelled):
+            self.reset_graph()
+        elif offline:
+            self.stop_server()
+        else:
+            self.release_server()
+        if export_file is not None:
+            publish_partial(export_file, keep=False)
+        self.is_running = False
+        job.finish(error=error)
+
+    def _start_monitor(self, mix):
+        """Publish the live output, drums included, into self.monitor."""
+        if not HAS_NUMPY:
+            return
+        if self.monitor is None:
+            self.monitor = MonitorRing(sr=int(self.server.getSamplingRate()))
+            print(f"[Info] Output monitor in shared memory {self.monitor.name}")
+        master = mix
+        if self.drums is not None:
+            master = mix + pyo.SPan(pyo.Mix(self.drums.outputs, voices=1), outs=2, pan=0)
+        self.monitor_tap = MonitorTap(self.server, master, self.monitor, self.server.getBufferSize())
+        self.graph += [master, self.monitor_tap.fill]
+
+    def _control(self, name, value):
+        """A SigTo starting at `value` that set_live can ramp; kept in self.controls."""
+        sig = pyo.SigTo(value, time=LIVE_RAMP, init=value)
+        self.controls[name] = sig
+        self.graph.append(sig)
+        return sig
+
+    def _live_fx(self, dry, beat_time, reverb_amount, delay_amount, bitcrush_amount, gb_mode):
+        """FX chain for live playback, with every stage built so set_live can dial it in.
+
+        Delay and Degrade replace the signal when on, as in an offline render;
+        here an Interp crossfades them in and out instead of rebuilding.
+        """
+        crush_on, bitdepth, srscale = degrade_params(bitcrush_amount, gb_mode)
+        verb = pyo.Freeverb(dry, size=0.8, damp=0.5, bal=self._control("rev", reverb_amount))
+        delayed = pyo.Delay(verb, delay=self._control("dly_time", beat_time * 0.75), feedback=0.3)
+        post_delay = pyo.Interp(verb, delayed, interp=self._control("dly", float(delay_amount > 0)))
+        crushed = pyo.Degrade(post_delay, bitdepth=self._control("bitdepth", bitdepth),
+                              srscale=self._control("srscale", srscale))
+        self.graph += [verb, delayed, post_delay, crushed]
+        return pyo.Interp(post_delay, crushed, interp=self._control("bit", float(crush_on)))
+
+    def set_live(self, rev=None, dly=None, bit=None, gb=None, tempo=None, scale=None):
+        """Retune the running live render in place. Arguments left as None keep their value.
+
+        FX amounts ramp over LIVE_RAMP, and delay and bitcrush crossfade on and
+        off. Tempo moves the step clock, the envelope lengths and the delay
+        time. A new scale recompiles the note sequence into the running Iters.
+        Returns False when no live render is playing.
+        """
+        live = self.live
+        if live is None or not self.is_running:
+            return False
+        settings = live["settings"]
+        for key, value in (("rev", rev), ("dly", dly), ("bit", bit), ("gb", gb)):
+            if value is not None:
+                settings[key] = value
+        controls = self.controls
+        controls["rev"].value = settings["rev"]
+        controls["dly"].value = float(settings["dly"] > 0)
+        crush_on, bitdepth, srscale = degrade_params(settings["bit"], settings["gb"])
+        controls["bit"].value = float(crush_on)
+        if crush_on:
+            controls["bitdepth"].value = bitdepth
+            controls["srscale"].value = srscale
+
+        if tempo and tempo != settings["tempo"]:
+            settings["tempo"] = tempo
+            beat_time = 60.0 / tempo
+            step_time = beat_time / 4
+            controls["step"].value = step_time
+            controls["dly_time"].value = beat_time * 0.75
+            for env, env_table, steps in self.envs:
+                env_table.replace(envelope_points(live["preset"], step_time * steps))
+                env.dur = step_time * steps
+
+        if scale in SCALES and scale != settings["scale"]:
+            settings["scale"] = scale
+            plan = live["plan"]
+            iters = self.mel_pat
+            bass_seq, lead_seq = compile_sequence(plan["code_int"], SCALES[scale], plan["cx"],
+                                                  live["steps"], root_note=plan["root_note"],
+                                                  with_lead=len(iters) > 1)
+            iters[0].setChoice(list(bass_seq))
+            if len(iters) > 1:
+                iters[1].setChoice(list(lead_seq))
+        return True
 
     def build_and_play(self, code, scale_name="Major", tempo_override=None,
                    gb_mode=False, preset_name="Pad", reverb_amount=0.4, delay_amount=0.2,
                    bitcrush_amount=0.0, export_file="out.wav", drums_on=True,
-                   gui_callback=None, length_override=None):
+                   gui_callback=None, length_override=None, offline=False,
+                   export_format="wav", job=None):
         # === SAFE, ORDERED MULTI-VOICE VERSION ===
-        
-        # --- PARSE CODE ---
+        # offline=True renders faster than realtime without an audio device
+        # and only returns once export_file is complete. Offline renders are
+        # served from / stored in self.cache when one is set. Offline,
+        # export_file may also be a writable binary stream (pipe, socket
+        # file) that receives the WAV block by block; export_format="flac"
+        # writes FLAC there instead. Files are written to a .partial path
+        # and renamed into place once complete. `job` (a RenderJob) can
+        # cancel the render from any thread; one is created when not given.
+
+        inst = self.instrument
+        timer = inst.stages(code=str(code), offline=bool(offline))
+        job = job if job is not None else RenderJob(code, export_file)
+        self.job = job
+        streaming = offline and not isinstance(export_file, str)
+        target_name = "stream" if streaming else export_file
+        # Stem recordings in flight, as {temp file: cache path}.
+        recorded = {}
+        recorders = []
+
+        def finish_stems(keep):
+            # Recorders close their files when released.
+            for rec in recorders:
+                rec.stop()
+            recorders.clear()
+            if not recorded:
+                return
+            if keep:
+                self.cache.store_stems(recorded)
+                return
+            for tmp in recorded:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+
         try:
-            code_int = int(code)
-        except Exception:
-            code_int = 0
-        
-        inst_count, wave_type, length, s = parse_code(code_int)
-        if length_override is not None:
-            length = int(length_override)
-        
-        # --- COMPLEXITY ---
-        cx = compute_complexity(code_int)
-        cx = ChaosBrake().clamp(cx)
-        
-        # --- TEMPO / SCALE ---
-        tempo = tempo_override if tempo_override else 90 + int(cx * 40)
-        beat_time = 60.0 / tempo
-        scale = SCALES.get(scale_name, SCALES["Major"])
-        root_note = 48
-        
-        # --- START SERVER ---
-        if gui_callback:
-            gui_callback("Starting audio engine...")
-        self.start_server(export_file)
-        
-        # --- VOICE COUNT ---
-        voice_count = min(2 + int(cx * 3), 5)
-        voices = []
-        
-        # --- WAVE TABLE ---
-        if wave_type == 0:
-            table = SineTable()
-        elif wave_type == 1:
-            table = SquareTable()
-        elif wave_type == 2:
-            table = SawTable()
-        else:
-            table = SineTable()
-        
-        # --- BASS ---
-        bass = Osc(table, freq=midiToHz(root_note), mul=0.25)
-        voices.append(bass)
-        
-        # --- CHORDS ---
-        if voice_count >= 3:
-            for n in chord_extensions(root_note, cx):
-                voices.append(Osc(table, freq=midiToHz(n), mul=0.08))
-        
-        # --- LEAD ---
-        lead = None
-        if voice_count >= 4:
-            lead = Osc(table, freq=midiToHz(root_note + 12), mul=0.18)
-            voices.append(lead)
-        
-        # --- TEXTURE ---
-        if voice_count >= 5:
-            voices.append(ButLP(Noise(0.02), freq=800 + cx * 1200))
-        
-        # --- DRUMS ---
-        kick_pat = None
-        snare_pat = None
-        hat_pat = None
-        if drums_on:
-            drum_engine = DrumEngine(cx, seed=code_int % 1000)
-            kick, snare, hat = drum_engine.patterns()
-            
-            # Kick drum
-            def play_kick():
-                k = Sine(freq=60, mul=0.8)
-                kenv = Adsr(0.001, 0.03, 0.0, 0.05, mul=0.9)
-                kick_voice = ButLP(k * kenv, freq=120).out()
-                kenv.play()
-            
-            # Snare drum
-            def play_snare():
-                s = Noise(mul=0.6)
-                senv = Adsr(0.001, 0.02, 0.0, 0.08, mul=0.7)
-                snare_voice = ButBP(s * senv, freq=1800, q=0.6).out()
-                senv.play()
-            
-            # Hi-hat
-            def play_hat():
-                h = Noise(mul=0.3)
-                henv = Adsr(0.001, 0.01, 0.0, 0.02, mul=0.4)
-                hat_voice = ButHP(h * henv, freq=6000).out()
-                henv.play()
-            
-            kick_pat = Pattern(play_kick, time=beat_time).play()
-            snare_pat = Pattern(play_snare, time=beat_time * 2).play()
-            hat_pat = Pattern(play_hat, time=beat_time / 2).play()
-        
-        # --- MIX / FX ---
-        mix = Mix(voices, voices=2)
-        if reverb_amount > 0:
-            mix = Freeverb(mix, size=0.8, damp=0.5, bal=reverb_amount)
-        if delay_amount > 0:
-            mix = Delay(mix, delay=beat_time * 0.75, feedback=0.3, mul=1)
-        
-        # Apply bitcrush if needed
-        if gb_mode or bitcrush_amount > 0.0:
-            if gb_mode:
-                mix = Degrade(mix, bitdepth=6, srscale=0.125)
+            # --- PARSE CODE / COMPLEXITY / TEMPO / SCALE ---
+            plan = plan_render(code, scale_name, tempo_override, length_override)
+            code_int, wave_type, length = plan["code_int"], plan["wave_type"], plan["length"]
+            cx, tempo, beat_time = plan["cx"], plan["tempo"], plan["beat_time"]
+            scale, root_note = plan["scale"], plan["root_note"]
+            preset = self.resolve_preset(preset_name)
+
+            # --- CACHE ---
+            cache_key = None
+            self.last_cache_hit = False
+            if offline and not streaming and self.cache is not None:
+                cache_key = render_cache_key(plan, preset, gb_mode, reverb_amount, delay_amount,
+                                             bitcrush_amount, drums_on, record_fileformat(export_file))
+                if self.cache.fetch(cache_key, export_file):
+                    self.last_cache_hit = True
+                    timer.lap("cache")
+                    inst.count("cache_hits")
+                    inst.flush(**timer.fields)
+                    job.finish(export_file)
+                    if gui_callback:
+                        gui_callback(f"Finished – saved {export_file} (cached)")
+                    return export_file
+
+            # --- START SERVER ---
+            if gui_callback:
+                gui_callback("Starting audio engine...")
+            self.reset_graph()
+            graph = self.graph
+            if streaming:
+                # The block tap does the writing; pyo's own recorder goes nowhere.
+                self.start_offline_server(os.devnull, length + RELEASE_TAIL, fileformat=3)
+            elif offline:
+                self.start_offline_server(partial_path(export_file), length + RELEASE_TAIL,
+                                          fileformat=record_fileformat(export_file))
             else:
-                mix = Degrade(mix, bitdepth=max(1, int(16 - bitcrush_amount*15)), 
-                             srscale=1.0 - bitcrush_amount*0.5)
-        
-        mix.out()
-        
-        # --- SEQUENCER ---
-        step = [0]
-        rng = random.Random(code_int)
-        
-        def tick():
-            deg = scale[(step[0] // 4) % len(scale)]
-            bass.freq = midiToHz(root_note + deg)
-            if lead is not None:
-                note = melody_step(scale, step[0] % len(scale), cx, rng)
-                lead.freq = midiToHz(root_note + note + 12)
-            step[0] += 1
-        
-        pat = Pattern(tick, time=beat_time / 4).play()
-        
-        # Store patterns for cleanup
-        self.pat = pat
-        self.drum_pat = kick_pat
-        self.is_running = True
-        
-        if gui_callback:
-            gui_callback(f"Playing {length}s at {tempo} BPM – recording to {export_file}")
-        
+                self.start_server(partial_path(export_file))
+            timer.lap("boot")
+            job.check()
+
+            # All output goes through one master fade, so a stop can fade
+            # out without sleeping on a pyo thread and every render ends alike.
+            fade = pyo.Fader(fadein=0.01, fadeout=STOP_FADE).play()
+            graph.append(fade)
+
+            # --- STEMS ---
+            # A cached render with the same notes but other FX left its dry
+            # stems behind; replaying them skips synthesis entirely.
+            stems = stem_key = None
+            if cache_key is not None and self.stems:
+                stem_key = stem_cache_key(plan, preset, drums_on)
+                stems = self.cache.fetch_stems(stem_key, drums_on)
+            pat = None
+            seq_iters = []
+            if stems is not None:
+                inst.count("stem_hits")
+                dry = pyo.SfPlayer(stems["voices"])
+                graph.append(dry)
+                if drums_on:
+                    graph.append(pyo.SfPlayer(stems["drums"]).out())
+                timer.lap("graph")
+            else:
+                # --- VOICE COUNT ---
+                voice_count = plan["voice_count"]
+                voices = self.voices
+
+                # --- SEQUENCE ---
+                # The whole note sequence is compiled up front and stepped by Iter
+                # objects on a Metro clock, so no Python runs on the 16th-note grid.
+                step_time = beat_time / 4
+                steps = int(length / step_time) + 1
+                bass_seq, lead_seq = compile_sequence(code_int, scale, cx, steps,
+                                                      root_note=root_note, with_lead=voice_count >= 4)
+
+                # --- WAVE TABLES ---
+                # Each voice reads the bank octave for the highest note it plays;
+                # voices landing in the same octave share one table.
+                sr = self.server.getSamplingRate()
+                tables = {}
+
+                def wave_table(freq):
+                    octave = wavetable_octave(freq)
+                    if octave not in tables:
+                        tables[octave] = pyo_wavetable(wave_type, freq, sr)
+                    return tables[octave]
+
+                # --- ENVELOPES ---
+                # One envelope per voice group, shaped by the preset and retriggered
+                # by the step clock: bass every beat, chords every bar, lead every
+                # 16th. The object count stays the same however many notes play.
+                # Live, the clock period is a control so set_live can change tempo.
+                pat = pyo.Metro(time=step_time if offline else self._control("step", step_time))
+                level = preset.get("mul", PRESET_MUL_REF) / PRESET_MUL_REF
+
+                def group_env(trig, note_dur):
+                    env_table = pyo.LinTable(envelope_points(preset, note_dur), size=ENV_TABLE_SIZE)
+                    env = pyo.TrigEnv(trig, table=env_table, dur=note_dur, mul=level)
+                    graph.extend([trig, env_table, env])
+                    self.envs.append((env, env_table, note_dur / step_time))
+                    return env
+
+                # --- BASS ---
+                bass_env = group_env(pyo.Select(pyo.Counter(pat, min=0, max=4), value=0), beat_time)
+                bass = pyo.Osc(wave_table(max(bass_seq)), freq=midiToHz(root_note), mul=bass_env * 0.25)
+                voices.append(bass)
+
+                # --- CHORDS ---
+                if voice_count >= 3:
+                    chord_env = group_env(pyo.Select(pyo.Counter(pat, min=0, max=16), value=0), beat_time * 4)
+                    for n in chord_extensions(root_note, cx):
+                        voices.append(pyo.Osc(wave_table(midiToHz(n)), freq=midiToHz(n), mul=chord_env * 0.08))
+
+                # --- LEAD ---
+                lead = None
+                if voice_count >= 4:
+                    lead_env = group_env(pat, step_time)
+                    lead = pyo.Osc(wave_table(max(lead_seq)), freq=midiToHz(root_note + 12), mul=lead_env * 0.18)
+                    voices.append(lead)
+
+                # --- TEXTURE ---
+                if voice_count >= 5:
+                    voices.append(pyo.ButLP(pyo.Noise(0.02), freq=800 + cx * 1200))
+
+                # --- DRUMS ---
+                # Stepped by the same Metro as the notes; stopping it stops the drums.
+                if drums_on:
+                    drum_engine = DrumEngine(cx, seed=code_int % DRUM_SEEDS)
+                    drums = DrumSampler(drum_bank(sr), pat, drum_engine.steps(), mul=fade)
+                    self.drums = drums
+                    graph.extend(drums.objects)
+                dry = pyo.Mix(voices, voices=2)
+                graph += voices + list(tables.values()) + [dry]
+                timer.lap("graph")
+
+                # --- SEQUENCER ---
+                seq_iters = [pyo.Iter(pat, choice=list(bass_seq), init=bass_seq[0])]
+                bass.setFreq(seq_iters[0])
+                if lead is not None:
+                    seq_iters.append(pyo.Iter(pat, choice=list(lead_seq), init=lead_seq[0]))
+                    lead.setFreq(seq_iters[1])
+                pat.play()
+                graph += [pat] + seq_iters
+                timer.lap("sequencing")
+
+            # With stems on, full offline renders record their dry stems for
+            # the next FX change.
+            if stem_key is not None and stems is None:
+                for name, path in self.cache.stem_paths(stem_key, drums_on).items():
+                    source = dry if name == "voices" else pyo.Mix(self.drums.outputs, voices=1)
+                    tmp = f"{path}.{os.getpid()}.tmp"
+                    os.makedirs(os.path.dirname(tmp), exist_ok=True)
+                    recorders.append(pyo.Record(source, tmp, chnls=2 if name == "voices" else 1,
+                                                fileformat=0, sampletype=3))
+                    graph.append(source)
+                    recorded[tmp] = path
+
+            # --- MIX / FX ---
+            # Offline renders only build the stages that are on; live ones
+            # build them all so set_live can change them while playing.
+            mix = dry
+            crush_on, bitdepth, srscale = degrade_params(bitcrush_amount, gb_mode)
+            if not offline:
+                mix = self._live_fx(dry, beat_time, reverb_amount, delay_amount, bitcrush_amount, gb_mode)
+            else:
+                if reverb_amount > 0:
+                    mix = pyo.Freeverb(mix, size=0.8, damp=0.5, bal=reverb_amount)
+                if delay_amount > 0:
+                    mix = pyo.Delay(mix, delay=beat_time * 0.75, feedback=0.3, mul=1)
+                if crush_on:
+                    mix = pyo.Degrade(mix, bitdepth=bitdepth, srscale=srscale)
+
+            mix.mul = fade
+            mix.out()
+            graph += [mix]
+            timer.lap("fx")
+
+            # Store patterns for cleanup
+            self.mix = mix
+            self.pat = pat
+            self.mel_pat = seq_iters
+            if not offline:
+                self.live = {"plan": plan, "preset": preset, "steps": steps,
+                             "settings": {"rev": reverb_amount, "dly": delay_amount,
+                                          "bit": bitcrush_amount, "gb": gb_mode,
+                                          "tempo": tempo, "scale": plan["scale_name"]}}
+            self.is_running = True
+            job.check()
+        except Exception as e:
+            finish_stems(keep=False)
+            self._abort_render(job, offline, None if streaming else export_file, e)
+            raise
+
         # --- STOP ---
-        def stop():
+        def stop_patterns():
+            if pat is None:
+                return
             try:
                 pat.stop()
-                if kick_pat:
-                    kick_pat.stop()
-                if snare_pat:
-                    snare_pat.stop()
-                if hat_pat:
-                    hat_pat.stop()
             except Exception as e:
                 print(f"[Debug] Pattern stop error: {e}")
-            
+
+        if offline:
+            if gui_callback:
+                gui_callback(f"Rendering {length}s at {tempo} BPM offline to {target_name}")
+            graph.append(pyo.CallAfter(stop_patterns, time=length))
+            graph.append(pyo.CallAfter(fade.stop, time=length))
+            tap = None
+            if streaming:
+                # Mirror what reaches the speakers: drums play on the left only.
+                master = mix
+                if self.drums is not None:
+                    master = mix + pyo.SPan(pyo.Mix(self.drums.outputs, voices=1), outs=2, pan=0)
+                writer = ChunkedWavWriter(export_file, sr=OFFLINE_SR, nchnls=2, fmt=export_format)
+                tap = BlockTap(self.server, master, writer)
+                graph += [master, tap.fill]
+            # Only the objects the engine tracks in self.graph; pyo objects
+            # created implicitly inside expressions (Counter/Select inputs,
+            # `env * 0.25` products, Mix internals) are not counted.
+            inst.count("dsp_objects", len(graph))
+
+            halted = []
+
+            def tick():
+                # Runs on the render thread once per buffer, so a cancel from
+                # any thread or process ends the render within one buffer.
+                if tap is not None:
+                    tap.pull()
+                if not halted and job.cancelled:
+                    halted.append(True)
+                    self.server.stop()
+
+            self.server.setCallback(tick)
             try:
-                fade = Fader(fadein=0.01, fadeout=0.5, dur=0.6).play()
-                time.sleep(0.6)
-            except Exception:
-                pass
-            
-            self.stop_server()
+                # Blocks until length + RELEASE_TAIL seconds have been rendered.
+                self.server.start()
+            except Exception as e:
+                finish_stems(keep=False)
+                self._abort_render(job, offline, None if streaming else export_file, e)
+                raise
+            finally:
+                clear_server_callback(self.server)
+                if tap is not None:
+                    tap.finish()
+            timer.lap("recording")
+            finish_stems(keep=not halted)
+            if self.keep_warm and not halted:
+                self.reset_graph()
+            else:
+                # A halted offline server is not reused.
+                self.stop_server()
+            timer.lap("teardown")
+            inst.flush(**timer.fields)
+            self.is_running = False
+            if not streaming:
+                publish_partial(export_file, keep=not job.cancelled)
+            if job.cancelled:
+                job.finish()
+                if gui_callback:
+                    gui_callback(f"Cancelled {target_name}")
+                raise RenderCancelled(f"render of {code} cancelled")
+            if cache_key is not None:
+                self.cache.store(cache_key, export_file)
+            job.finish(export_file)
+            if gui_callback:
+                gui_callback(f"Finished – saved {target_name}")
+            return export_file
+
+        self._start_monitor(mix)
+        # Tracked objects only, as for offline renders.
+        inst.count("dsp_objects", len(graph))
+        if gui_callback:
+            gui_callback(f"Playing {length}s at {tempo} BPM – recording to {export_file}")
+
+        stopping = threading.Lock()
+
+        def stop():
+            # Called by CallAfter at the end of the track, or by job.cancel()
+            # from any thread. Only starts the fade; the teardown runs on a
+            # timer thread after RELEASE_TAIL, as offline renders stop
+            # recording then too, so no caller ever waits.
+            if not stopping.acquire(blocking=False):
+                return
+            stop_patterns()
+            try:
+                fade.stop()
+            except Exception as e:
+                print(f"[Debug] Fade stop error: {e}")
+            timer.lap("recording")
+            threading.Timer(RELEASE_TAIL, teardown).start()
+
+        def teardown():
+            self.release_server()
+            timer.lap("teardown")
+            inst.flush(**timer.fields)
+            publish_partial(export_file, keep=not job.cancelled)
             self.is_running = False
+            job.finish(export_file)
             if gui_callback:
-                gui_callback(f"Finished – saved {export_file}")
-        
-        CallAfter(stop, time=length)
+                gui_callback("Stopped" if job.cancelled else f"Finished – saved {export_file}")
+
+        graph.append(pyo.CallAfter(stop, time=length))
+        job.on_cancel(stop)
+        return export_file
+
+
+# ---------------- NumPy Reference Renderer ----------------
+NP_BLOCK = 65536
+TEXTURE_LOOP_SECONDS = 2.0
+# Freeverb tunings at 44.1 kHz; the right channel uses delays + FREEVERB_SPREAD.
+FREEVERB_COMBS = [1116, 1188, 1277, 1356, 1422, 1491, 1557, 1617]
+FREEVERB_ALLPASSES = [556, 441, 341, 225]
+FREEVERB_SPREAD = 23
+REVERB_IR_SECONDS = 3.0
+
+# Filter coefficients, drum hits and reverb spectra are shared by
+# every render in the process, so a batch only builds them once.
+_NP_CACHE = {}
+
+
+def _np_cached(key, build):
+    if key not in _NP_CACHE:
+        _NP_CACHE[key] = build()
+    return _NP_CACHE[key]
+
+
+def _np_osc(table, freqs, phase, sr):
+    """Linear-interpolating wavetable lookup; returns (signal, phase after block)."""
+    size = len(table) - 1
+    inc = freqs / sr
+    ph = phase + np.cumsum(inc) - inc
+    pos = (ph % 1.0) * size
+    idx = pos.astype(np.int64)
+    frac = pos - idx
+    out = table[idx] + (table[idx + 1] - table[idx]) * frac
+    return out, (phase + inc.sum()) % 1.0
+
+
+def _np_drum_hits(sr):
+    """The shared DrumBank hits as float arrays."""
+    return _np_cached(("drums", sr), lambda: {name: np.array(hit, dtype=float)
+                                              for name, hit in drum_bank(sr).samples.items()})
+
+
+def _np_comb(x, delay, feedback, damp):
+    """Freeverb lowpass-feedback comb, vectorised one delay length at a time."""
+    n = len(x)
+    out = np.zeros(n)
+    written = np.zeros(n)
+    # The damping one-pole, truncated where damp**k is below float precision.
+    kern = (1.0 - damp) * damp ** np.arange(24)
+    for start in range(0, n, delay):
+        stop = min(start + delay, n)
+        if start >= delay:
+            out[start:stop] = written[start - delay:stop - delay]
+        lo = max(0, start - len(kern) + 1)
+        f = np.convolve(out[lo:stop], kern)[start - lo:stop - lo]
+        written[start:stop] = x[start:stop] + feedback * f
+    return out
+
+
+def _np_allpass(x, delay, feedback=0.5):
+    n = len(x)
+    out = np.empty(n)
+    written = np.zeros(n)
+    for start in range(0, n, delay):
+        stop = min(start + delay, n)
+        past = written[start - delay:stop - delay] if start >= delay else np.zeros(stop - start)
+        out[start:stop] = past - x[start:stop]
+        written[start:stop] = x[start:stop] + feedback * past
+    return out
+
+
+def _np_reverb_ir(sr, size=0.8, damp=0.5):
+    """Stereo impulse response of Freeverb(size, damp), computed once per rate."""
+    return _np_cached(("reverb", sr, size, damp), lambda: _build_reverb_ir(sr, size, damp))
+
+
+def _build_reverb_ir(sr, size, damp):
+    n = int(REVERB_IR_SECONDS * sr)
+    impulse = np.zeros(n)
+    impulse[0] = 0.015 * 3.0  # fixed input gain * wet scale
+    scale = sr / 44100.0
+    feedback = size * 0.28 + 0.7
+    irs = []
+    for spread in (0, FREEVERB_SPREAD):
+        wet = sum(_np_comb(impulse, int((d + spread) * scale), feedback, damp * 0.4)
+                  for d in FREEVERB_COMBS)
+        for d in FREEVERB_ALLPASSES:
+            wet = _np_allpass(wet, int((d + spread) * scale))
+        irs.append(wet)
+    return np.array(irs)
+
+
+class _NpConvolver:
+    """Streaming FFT overlap-add convolution of stereo blocks with a stereo IR."""
+    def __init__(self, ir, block, sr=None):
+        self.m = ir.shape[1]
+        self.nfft = 1 << (block + self.m - 2).bit_length()
+        # The IR spectrum only depends on the rate and FFT size.
+        self.H = _np_cached(("reverb_fft", sr, self.nfft), lambda: np.fft.rfft(ir, self.nfft)) \
+            if sr is not None else np.fft.rfft(ir, self.nfft)
+        self.tail = np.zeros((ir.shape[0], self.m - 1))
+
+    def process(self, x):
+        n = x.shape[1]
+        y = np.fft.irfft(np.fft.rfft(x, self.nfft) * self.H, self.nfft)[:, :n + self.m - 1]
+        y[:, :self.m - 1] += self.tail
+        self.tail = y[:, n:].copy()
+        return y[:, :n]
+
+
+class _NpDelay:
+    """pyo Delay: y[n] = x[n-D] + feedback * y[n-D], in chunks of at most D."""
+    def __init__(self, delay, feedback, chnls=2):
+        self.d = max(1, int(delay))
+        self.feedback = feedback
+        self.x_hist = np.zeros((chnls, self.d))
+        self.y_hist = np.zeros((chnls, self.d))
+
+    def process(self, x):
+        out = np.empty_like(x)
+        for start in range(0, x.shape[1], self.d):
+            chunk = x[:, start:start + self.d]
+            k = chunk.shape[1]
+            y = self.x_hist[:, :k] + self.feedback * self.y_hist[:, :k]
+            out[:, start:start + k] = y
+            self.x_hist = np.concatenate([self.x_hist[:, k:], chunk], axis=1)
+            self.y_hist = np.concatenate([self.y_hist[:, k:], y], axis=1)
+        return out
+
+
+class _NpDegrade:
+    """pyo Degrade: bit reduction plus a sample-and-hold every ceil(1/srscale) samples."""
+    def __init__(self, bitdepth, srscale, chnls=2):
+        self.bitscl = 2.0 ** (bitdepth - 1)
+        self.hold = max(1, int(np.ceil(1.0 / srscale)))
+        self.value = np.zeros((chnls, 1))
+
+    def process(self, x, start):
+        q = np.trunc(x * self.bitscl + 0.5) / self.bitscl
+        n = start + np.arange(x.shape[1])
+        src = (n + 1) // self.hold * self.hold - 1 - start
+        held = np.where(src >= 0, q[:, np.clip(src, 0, None)], self.value)
+        self.value = held[:, -1:]
+        return held
+
+
+class NumpyRenderer:
+    """Pure NumPy render of the layers build_and_play puts on a pyo server.
+
+    It follows the same code-to-music logic: plan_render, compile_sequence,
+    the preset group envelopes, the drum periods and Mix's channel order.
+    The DSP is batched array maths: wavetable lookup, vectorised envelopes,
+    a convolution Freeverb and block Delay/Degrade. The output is
+    deterministic, and it is a reference rather than a sample-exact copy of
+    pyo's DSP. Audio is produced in blocks of NP_BLOCK frames, so memory
+    does not grow with track length.
+    """
+    def __init__(self, code, scale_name="Major", tempo_override=None, gb_mode=False,
+                 preset=None, reverb_amount=0.4, delay_amount=0.2, bitcrush_amount=0.0,
+                 drums_on=True, length_override=None, sr=OFFLINE_SR, block=NP_BLOCK):
+        if not HAS_NUMPY:
+            raise RuntimeError("NumpyRenderer needs numpy")
+        self.plan = plan_render(code, scale_name, tempo_override, length_override)
+        self.preset = preset or DEFAULT_PRESETS["Pad"]
+        self.gb_mode = gb_mode
+        self.reverb_amount = reverb_amount
+        self.delay_amount = delay_amount
+        self.bitcrush_amount = bitcrush_amount
+        self.drums_on = drums_on
+        self.sr = sr
+        self.block = block
+        self.frames = int((self.plan["length"] + RELEASE_TAIL) * sr)
+
+    def _voices(self):
+        """(kind, level, envelope group, freq source) per voice, in Mix order."""
+        plan = self.plan
+        root, cx = plan["root_note"], plan["cx"]
+        voices = [("osc", 0.25, "bass", "bass")]
+        if plan["voice_count"] >= 3:
+            for n in chord_extensions(root, cx):
+                voices.append(("osc", 0.08, "chord", midiToHz(n)))
+        if plan["voice_count"] >= 4:
+            voices.append(("osc", 0.18, "lead", "lead"))
+        if plan["voice_count"] >= 5:
+            voices.append(("texture", 1.0, None, None))
+        return voices
+
+    def _envelope(self, t, note_dur):
+        """Group envelope at times t for a TrigEnv retriggered every note_dur until length."""
+        points = envelope_points(self.preset, note_dur)
+        xp = np.array([p[0] for p in points], dtype=float) / (ENV_TABLE_SIZE - 1)
+        fp = np.array([p[1] for p in points])
+        last = max(int(np.ceil(self.plan["length"] / note_dur)) - 1, 0)
+        since = t - np.minimum(np.floor(t / note_dur), last) * note_dur
+        env = np.interp(since / note_dur, xp, fp, right=0.0)
+        return env * (self.preset.get("mul", PRESET_MUL_REF) / PRESET_MUL_REF)
+
+    def blocks(self):
+        """Yield stereo float64 blocks of shape (2, n) until the track is done."""
+        plan, sr = self.plan, self.sr
+        beat, length = plan["beat_time"], plan["length"]
+        step_time = beat / 4
+        steps = int(length / step_time) + 1
+        rng = np.random.default_rng(plan["code_int"])
+        voices = self._voices()
+        bass_seq, lead_seq = compile_sequence(plan["code_int"], plan["scale"], plan["cx"], steps,
+                                              root_note=plan["root_note"],
+                                              with_lead=plan["voice_count"] >= 4)
+        seqs = {"bass": np.array(bass_seq, dtype=float), "lead": np.array(lead_seq, dtype=float)}
+        # Band-limited for the highest note each voice plays, like the pyo path.
+        tables = [None if kind == "texture" else
+                  wavetable_row(plan["wave_type"], seqs[freq].max() if isinstance(freq, str) else freq, sr)
+                  for kind, level, group, freq in voices]
+        note_durs = {"bass": beat, "chord": beat * 4, "lead": step_time}
+        phases = [0.0] * len(voices)
+
+        texture = None
+        if plan["voice_count"] >= 5:
+            loop = rng.uniform(-1.0, 1.0, int(TEXTURE_LOOP_SECONDS * sr)) * 0.02
+            texture = np.array(biquad(loop.tolist(), butterworth("lp", 800 + plan["cx"] * 1200, sr)))
+
+        hits = []
+        if self.drums_on:
+            samples = _np_drum_hits(sr)
+            drum_steps = DrumEngine(plan["cx"], seed=plan["code_int"] % DRUM_SEEDS).steps()
+            for name, pattern in zip(DRUM_HITS, drum_steps):
+                on = np.flatnonzero(np.resize(np.array(pattern, dtype=bool), steps))
+                starts = (on * step_time * sr).astype(np.int64)
+                hits.append((samples[name], starts[on * step_time < length]))
+
+        reverb = None
+        if self.reverb_amount > 0:
+            reverb = _NpConvolver(_np_reverb_ir(sr), min(self.block, self.frames), sr)
+        delay = None
+        if self.delay_amount > 0:
+            delay = _NpDelay(beat * 0.75 * sr, 0.3)
+        degrade = None
+        if self.gb_mode:
+            degrade = _NpDegrade(6, 0.125)
+        elif self.bitcrush_amount > 0.0:
+            degrade = _NpDegrade(max(1, int(16 - self.bitcrush_amount * 15)),
+                                 1.0 - self.bitcrush_amount * 0.5)
+
+        for start in range(0, self.frames, self.block):
+            n = min(self.block, self.frames - start)
+            t = (start + np.arange(n)) / sr
+            step = np.minimum((t / step_time).astype(np.int64), steps - 1)
+            envs = {g: self._envelope(t, d) for g, d in note_durs.items()}
+
+            mix = np.zeros((2, n))
+            for i, (kind, level, group, freq) in enumerate(voices):
+                if kind == "texture":
+                    idx = (start + np.arange(n)) % len(texture)
+                    sig = texture[idx]
+                else:
+                    freqs = seqs[freq][step] if isinstance(freq, str) else np.full(n, freq)
+                    sig, phases[i] = _np_osc(tables[i], freqs, phases[i], sr)
+                    sig *= envs[group] * level
+                # Mix(voices, voices=2) deals streams round-robin to channels.
+                mix[i % 2] += sig
+
+            if reverb is not None:
+                mix = mix * (1.0 - self.reverb_amount) + reverb.process(mix) * self.reverb_amount
+            if delay is not None:
+                mix = delay.process(mix)
+            if degrade is not None:
+                mix = degrade.process(mix, start)
+
+            # Drums bypass the FX and, as mono .out() streams, play on the left.
+            for sample, starts in hits:
+                lo = np.searchsorted(starts, start - len(sample), side="right")
+                hi = np.searchsorted(starts, start + n, side="left")
+                for s0 in starts[lo:hi]:
+                    a, b = max(s0, start), min(s0 + len(sample), start + n)
+                    mix[0, a - start:b - start] += sample[a - s0:b - s0]
+            # The master Fader ramps everything down over STOP_FADE from `length`.
+            mix *= np.clip(1.0 - (t - length) / STOP_FADE, 0.0, 1.0)
+            yield mix
+
+    def render(self):
+        return np.concatenate(list(self.blocks()), axis=1)
+
+    def write(self, target, fmt="wav", job=None):
+        """Stream the render to `target`; a cancelled `job` stops it between blocks."""
+        writer = ChunkedWavWriter(target, sr=self.sr, nchnls=2, fmt=fmt)
+        try:
+            for block in self.blocks():
+                if job is not None:
+                    job.check()
+                writer.write_array(block)
+        finally:
+            writer.close()
+
+
+def render_numpy(code, export_file, preset_name="Pad", presets=None, cache=None, job=None,
+                 **kwargs):
+    """Render a code to a WAV/FLAC file with NumpyRenderer, through the render cache.
+
+    Takes the build_and_play keyword arguments that affect the audio.
+    Returns True on a cache hit. Like build_and_play, the file is written
+    to a .partial path first and a cancelled `job` leaves nothing behind.
+    """
+    preset = resolve_preset(presets, preset_name)
+    renderer = NumpyRenderer(code, preset=preset, **kwargs)
+    fmt = "flac" if record_fileformat(export_file) == 5 else "wav"
+    key = None
+    if cache is not None:
+        key = render_cache_key(renderer.plan, preset, renderer.gb_mode, renderer.reverb_amount,
+                               renderer.delay_amount, renderer.bitcrush_amount, renderer.drums_on,
+                               record_fileformat(export_file), engine="numpy")
+        if cache.fetch(key, export_file):
+            return True
+    try:
+        renderer.write(partial_path(export_file), fmt=fmt, job=job)
+    except BaseException:
+        publish_partial(export_file, keep=False)
+        raise
+    publish_partial(export_file)
+    if key is not None:
+        cache.store(key, export_file)
+    return False
+
+
+PREVIEW_SECONDS = 8
+
+
+def render_previews(codes, seconds=PREVIEW_SECONDS, out=None, sr=OFFLINE_SR, tail=False,
+                    presets=None, preset_name="Pad", **kwargs):
+    """Render short previews of many codes into one (len(codes), 2, frames) float32 array.
+
+    `out` may name a .npy file, which is then filled through a memory map
+    and returned open, so big catalogues never have to fit in RAM. All
+    previews share one length, and wavetables, filter coefficients, drum
+    hits and the reverb spectrum are built once for the whole batch.
+    Remaining keyword arguments are NumpyRenderer settings applied to every
+    code.
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError("render_previews needs numpy")
+    codes = list(codes)
+    preset = resolve_preset(presets, preset_name)
+    frames = int((seconds + (RELEASE_TAIL if tail else 0.0)) * sr)
+    shape = (len(codes), 2, frames)
+    if out is None:
+        batch = np.zeros(shape, dtype=np.float32)
+    else:
+        batch = np.lib.format.open_memmap(out, mode="w+", dtype=np.float32, shape=shape)
+    for i, code in enumerate(codes):
+        renderer = NumpyRenderer(code, preset=preset, length_override=seconds, sr=sr,
+                                 block=frames, **kwargs)
+        # One block covers the whole preview; the release tail is cut unless asked for.
+        batch[i] = next(renderer.blocks())[:, :frames]
+    if out is not None:
+        batch.flush()
+    return batch
+
+
+# ---------------- Progressive Preview ----------------
+# Small blocks so the first one is ready within a few hundred milliseconds.
+PROGRESSIVE_BLOCK = 8192
+PROGRESSIVE_SKIP = 5.0
+# How far rendering may run ahead of playback; tracks can be minutes long.
+PROGRESSIVE_AHEAD = 30.0
+
+
+class ProgressivePreview:
+    """Play a code through sounddevice while NumpyRenderer renders the rest.
+
+    A background thread renders the track block by block into one float32
+    buffer, staying at most PROGRESSIVE_AHEAD seconds ahead of playback.
+    The buffer is zero-allocated, so only rendered pages use memory. The
+    OutputStream callback plays whatever is already rendered and outputs
+    silence if the renderer falls behind. Playback starts with the first
+    block, and seek()/skip() can jump anywhere in the rendered part.
+
+    Takes NumpyRenderer's keyword arguments, with the preset given by name
+    like build_and_play. A cancelled `job` stops both the render and the
+    playback.
+    """
+    def __init__(self, code, preset_name="Pad", presets=None, job=None,
+                 block=PROGRESSIVE_BLOCK, **kwargs):
+        if not (HAS_NUMPY and HAS_SOUNDDEVICE):
+            raise RuntimeError("Progressive preview needs numpy and sounddevice")
+        preset = resolve_preset(presets, preset_name)
+        self.renderer = NumpyRenderer(code, preset=preset, block=block, **kwargs)
+        self.sr = self.renderer.sr
+        self.total = self.renderer.frames
+        self.audio = np.zeros((self.total, 2), dtype=np.float32)
+        # Frames rendered so far / next frame to play; each has a single writer.
+        self.rendered = 0
+        self.pos = 0
+        self.job = job if job is not None else RenderJob(code)
+        self.job.on_cancel(self.stop)
+        self.stream = None
+        self.thread = threading.Thread(target=self._render, daemon=True)
+
+    def start(self):
+        # Open the device before rendering, so a missing one leaves no
+        # render thread behind.
+        try:
+            self.stream = sd.OutputStream(samplerate=self.sr, channels=2, dtype="float32",
+                                          callback=self._callback, finished_callback=self._finished)
+            self.thread.start()
+            self.stream.start()
+        except Exception:
+            self.job.cancel()
+            raise
+        return self
+
+    def _render(self):
+        ahead = int(PROGRESSIVE_AHEAD * self.sr)
+        try:
+            for block in self.renderer.blocks():
+                while self.rendered - self.pos > ahead and not self.job.cancelled:
+                    time.sleep(0.05)
+                self.job.check()
+                n = block.shape[1]
+                self.audio[self.rendered:self.rendered + n] = block.T
+                self.rendered += n
+        except RenderCancelled:
+            pass
+        except Exception as e:
+            print(f"[Warning] Preview render failed: {e}")
+            self.job.finish(error=e)
+            self.stop()
+
+    def _callback(self, outdata, frames, time_info, status):
+        pos = self.pos
+        n = max(0, min(frames, self.rendered - pos))
+        outdata[:n] = self.audio[pos:pos + n]
+        outdata[n:] = 0
+        self.pos = pos + n
+        if self.pos >= self.total:
+            raise sd.CallbackStop
+
+    def _finished(self):
+        # Runs on the PortAudio thread, which may not close its own stream.
+        if not self.job.cancelled:
+            self.job.finish()
+        threading.Thread(target=self._close, daemon=True).start()
+
+    def _close(self, abort=False):
+        stream, self.stream = self.stream, None
+        if stream is None:
+            return
+        try:
+            if abort:
+                stream.abort()
+            stream.close()
+        except Exception as e:
+            print(f"[Debug] Preview stream close: {e}")
+
+    @property
+    def position(self):
+        return self.pos / self.sr
+
+    @property
+    def buffered(self):
+        return self.rendered / self.sr
+
+    @property
+    def length(self):
+        return self.total / self.sr
+
+    def seek(self, seconds):
+        """Jump to `seconds`, clamped to what has been rendered; returns the new position."""
+        self.pos = max(0, min(int(seconds * self.sr), self.rendered))
+        return self.position
+
+    def skip(self, seconds=PROGRESSIVE_SKIP):
+        return self.seek(self.position + seconds)
+
+    def done(self):
+        return self.job.done()
+
+    def stop(self):
+        # Runs from job.cancel(); the render thread sees the cancel itself.
+        self._close(abort=True)
+        if not self.job.done():
+            self.job.finish()
+
+
+# ---------------- Render Farm ----------------
+# A job that takes its worker process down is retried once on a fresh pool
+# before it is reported as failed.
+MAX_JOB_ATTEMPTS = 2
+
+_worker_synth = None
+_worker_cancel = None
+
+
+def settings_to_kwargs(settings):
+    """Map FullGUI.collect_ui() fields onto build_and_play keyword arguments."""
+    return {
+        'scale_name': settings.get('scale', 'Major'),
+        'tempo_override': settings.get('tempo'),
+        'gb_mode': settings.get('gb', False),
+        'preset_name': settings.get('preset', 'Pad'),
+        'reverb_amount': settings.get('rev', 0.4),
+        'delay_amount': settings.get('dly', 0.2),
+        'bitcrush_amount': settings.get('bit', 0.0),
+        'drums_on': settings.get('drums', True),
+        'length_override': settings.get('length'),
+    }
+
+
+def _render_worker_init(stdout_to_stderr=False, cache_dir=None, cache_max_bytes=RENDER_CACHE_MAX_BYTES,
+                        trace_file=None, cancel_event=None):
+    global _worker_synth, _worker_cancel
+    _worker_cancel = cancel_event
+    # Ctrl-C is the parent's to handle; it cancels and shuts the pool down.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if stdout_to_stderr:
+        # Keep the parent's stdout clean for machine-readable results, even
+        # from messages pyo prints at C level.
+        sys.stdout.flush()
+        os.dup2(2, 1)
+        sys.stdout = sys.stderr
+    cache = RenderCache(cache_dir, cache_max_bytes) if cache_dir else None
+    instrument = Instrumentation([LogFileSink(trace_file)] if trace_file else None)
+    _worker_synth = BenSynth(background_init=False, cache=cache, keep_warm=True,
+                             instrument=instrument, presets=PresetStore())
+
+
+def _render_job(job):
+    """Render one job offline inside a worker; errors become part of the result."""
+    start = time.time()
+    result = {"code": job["code"], "file": job["export_file"], "ok": True, "error": None}
+    if job.get("error"):
+        result.update(ok=False, error=job["error"], seconds=0.0)
+        return result
+    # Every job in this worker shares the farm-wide cancel flag.
+    token = RenderJob(job["code"], job["export_file"], event=_worker_cancel)
+    try:
+        token.check()
+        kwargs = settings_to_kwargs(job.get("settings", {}))
+        if job.get("engine") == "numpy":
+            result["cached"] = render_numpy(job["code"], job["export_file"],
+                                            presets=_worker_synth.presets,
+                                            cache=_worker_synth.cache, job=token, **kwargs)
+        else:
+            _worker_synth.build_and_play(job["code"], export_file=job["export_file"],
+                                         offline=True, job=token, **kwargs)
+            result["cached"] = _worker_synth.last_cache_hit
+    except RenderCancelled:
+        result.update(ok=False, error="cancelled", cancelled=True)
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.time() - start, 3)
+    return result
+
+
+class RenderFarm:
+    """Process pool in which every worker owns its own offline pyo server.
+
+    pyo runs one server per process, so renders scale across processes.
+    Workers live as long as the farm and keep their server booted between
+    jobs, so only the first job on each worker pays for the boot.
+    Results come back in submission order and a failing job only fails
+    its own result.
+    """
+    def __init__(self, workers=None, stdout_to_stderr=False, cache_dir=None,
+                 cache_max_bytes=RENDER_CACHE_MAX_BYTES, trace_file=None, runner=None):
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        # Module-level function run per job in a worker; _render_job unless
+        # a caller (e.g. a test) needs another. It must be importable there.
+        self.runner = runner or _render_job
+        self.stdout_to_stderr = stdout_to_stderr
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.trace_file = trace_file
+        self.executor = None
+        # Workers are spawned, never forked: the parent may hold Tk and a
+        # booted live pyo server, and frozen builds can only spawn.
+        self.context = multiprocessing.get_context("spawn")
+        # Shared with every worker; set() cancels running and queued jobs.
+        self.cancel_event = self.context.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def submit(self, job):
+        """Queue one job on the pool and return its concurrent.futures.Future."""
+        if self.executor is None:
+            if HAS_NUMPY:
+                # Write the wavetable file once here; workers then just map it.
+                wavetable_bank(OFFLINE_SR)
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self.context,
+                                                initializer=_render_worker_init,
+                                                initargs=(self.stdout_to_stderr, self.cache_dir,
+                                                          self.cache_max_bytes, self.trace_file,
+                                                          self.cancel_event))
+        return self.executor.submit(self.runner, job)
+
+    def restart(self):
+        try:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        except Exception as e:
+            print(f"[Debug] pool shutdown: {e}")
+        self.executor = None
+
+    def render(self, jobs):
+        """Yield a result dict per job, in the order the jobs were given.
+
+        Each job is {'code', 'export_file', 'settings'} where settings uses the
+        FullGUI.collect_ui() keys; a job carrying 'error' is reported as failed
+        without rendering. `jobs` is consumed lazily, so it can be a
+        stream; at most two jobs per worker are in flight at any time.
+        After cancel() no more jobs are taken from `jobs` and the ones
+        already submitted come back with error "cancelled".
+        """
+        self.cancel_event.clear()
+        jobs = iter(jobs)
+        pending = deque()
+        index = 0
+        while True:
+            while len(pending) < self.workers * 2 and not self.cancel_event.is_set():
+                job = next(jobs, None)
+                if job is None:
+                    break
+                pending.append([index, job, 1, self.submit(job)])
+                index += 1
+            if not pending:
+                return
+
+            idx, job, attempt, fut = pending.popleft()
+            try:
+                result = fut.result()
+            except CancelledError:
+                result = {"code": job["code"], "file": job["export_file"], "ok": False,
+                          "error": "cancelled", "cancelled": True, "seconds": None}
+            except BrokenProcessPool as e:
+                # A worker died; we cannot tell which job killed it, so every
+                # in-flight job gets one more try on a fresh pool.
+                self.restart()
+                if attempt < MAX_JOB_ATTEMPTS:
+                    pending.appendleft([idx, job, attempt, None])
+                for entry in pending:
+                    done = entry[3]
+                    if done is not None and done.done() and not done.cancelled() \
+                            and done.exception() is None:
+                        # Finished before the crash; keep its result.
+                        continue
+                    entry[2] += 1
+                    entry[3] = self.submit(entry[1])
+                if attempt < MAX_JOB_ATTEMPTS:
+                    continue
+                result = {"code": job["code"], "file": job["export_file"], "ok": False,
+                          "error": f"worker crashed: {e}", "seconds": None}
+            except Exception as e:
+                result = {"code": job["code"], "file": job["export_file"], "ok": False,
+                          "error": f"{type(e).__name__}: {e}", "seconds": None}
+            result["index"] = idx
+            yield result
+
+    def cancel(self):
+        """Cancel the current render() from any thread without waiting.
+
+        Jobs still queued in the pool are dropped and running ones stop
+        within one server buffer; render() then drains and returns.
+        """
+        self.cancel_event.set()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
 
 
 # ---------------- GUI ----------------
 class FullGUI:
     def __init__(self):
-        self.synth = BenSynth()
+        self.presets = PresetStore()
+        # Boot the live server while the window builds.
+        # The cache keeps dry stems too, so FX tweaks re-export without resynthesis.
+        self.synth = BenSynth(background_init=True, keep_warm=True, presets=self.presets,
+                              cache=RenderCache(), stems=True)
+        self.job = None
+        self.farm = None
+        self.preview = None
+        self.scope_window = None
         self.root = tk.Tk()
         self.root.title("Ben's Synth – Presets & Queue")
         self.root.geometry("800x600")
@@ -481,6 +2915,7 @@ class FullGUI:
         self.scale_var = tk.StringVar(value="Major")
         self.scale_box = ttk.Combobox(left, textvariable=self.scale_var, values=list(SCALES.keys()), state="readonly", width=16)
         self.scale_box.pack(anchor="w", pady=2)
+        self.scale_box.bind("<<ComboboxSelected>>", self.on_live_change)
 
         ttk.Label(left, text="Preset:").pack(anchor="w", pady=(8,0))
         self.preset_var = tk.StringVar(value="Pad")
@@ -495,23 +2930,30 @@ class FullGUI:
         ttk.Label(left, text="Tempo (BPM):").pack(anchor="w", pady=(8,0))
         self.tempo_entry = ttk.Entry(left, width=10)
         self.tempo_entry.pack(anchor="w", pady=2)
+        self.tempo_entry.bind("<Return>", self.on_live_change)
         ttk.Label(left, text="Länge (s, optional):").pack(anchor="w", pady=(6,0))
         self.length_entry = ttk.Entry(left, width=10)
         self.length_entry.pack(anchor="w", pady=2)
 
         self.gb_var = tk.BooleanVar(value=False)
         self.drum_var = tk.BooleanVar(value=True)
-        ttk.Checkbutton(left, text="Gameboy Mode", variable=self.gb_var).pack(anchor="w", pady=4)
+        self.offline_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(left, text="Gameboy Mode", variable=self.gb_var,
+                        command=self.on_live_change).pack(anchor="w", pady=4)
         ttk.Checkbutton(left, text="Drums", variable=self.drum_var).pack(anchor="w", pady=2)
+        ttk.Checkbutton(left, text="Offline Export (no playback)", variable=self.offline_var).pack(anchor="w", pady=2)
 
         ttk.Label(left, text="Reverb:").pack(anchor="w", pady=(8,0))
-        self.rev_scale = ttk.Scale(left, from_=0.0, to=0.95, value=0.4, orient="horizontal", length=160)
+        self.rev_scale = ttk.Scale(left, from_=0.0, to=0.95, value=0.4, orient="horizontal", length=160,
+                                   command=self.on_live_change)
         self.rev_scale.pack(anchor="w")
         ttk.Label(left, text="Delay:").pack(anchor="w", pady=(6,0))
-        self.dly_scale = ttk.Scale(left, from_=0.0, to=0.95, value=0.2, orient="horizontal", length=160)
+        self.dly_scale = ttk.Scale(left, from_=0.0, to=0.95, value=0.2, orient="horizontal", length=160,
+                                   command=self.on_live_change)
         self.dly_scale.pack(anchor="w")
         ttk.Label(left, text="Bitcrush:").pack(anchor="w", pady=(6,0))
-        self.bit_scale = ttk.Scale(left, from_=0.0, to=1.0, value=0.0, orient="horizontal", length=160)
+        self.bit_scale = ttk.Scale(left, from_=0.0, to=1.0, value=0.0, orient="horizontal", length=160,
+                                   command=self.on_live_change)
         self.bit_scale.pack(anchor="w")
 
         ttk.Label(left, text="Export filename:").pack(anchor="w", pady=(8,0))
@@ -523,6 +2965,8 @@ class FullGUI:
         btns.pack(anchor="w", pady=8)
         ttk.Button(btns, text="Start (Play & Record)", command=self.on_start).pack(side="left", padx=2)
         ttk.Button(btns, text="Stop", command=self.on_stop).pack(side="left", padx=2)
+        ttk.Button(btns, text="Preview", command=self.on_preview).pack(side="left", padx=2)
+        ttk.Button(btns, text=f"Skip +{PROGRESSIVE_SKIP:g}s", command=self.on_skip).pack(side="left", padx=2)
         ttk.Button(btns, text="Show Scope", command=self.show_scope).pack(side="left", padx=2)
 
         right = ttk.Frame(body)
@@ -538,6 +2982,10 @@ class FullGUI:
         ttk.Button(qbtns, text="Remove Selected", command=self.remove_selected_queue).pack(side="left", padx=4)
         ttk.Button(qbtns, text="Render Queue", command=self.render_queue).pack(side="left", padx=4)
         ttk.Button(qbtns, text="Save Queue...", command=self.save_queue).pack(side="left", padx=4)
+        ttk.Label(qbtns, text="Workers:").pack(side="left", padx=(8,2))
+        self.workers_entry = ttk.Entry(qbtns, width=4)
+        self.workers_entry.insert(0, str(os.cpu_count() or 1))
+        self.workers_entry.pack(side="left")
 
         self.status_var = tk.StringVar(value="Audio engine initializing in background...")
         ttk.Label(self.root, textvariable=self.status_var).pack(fill="x", pady=(6,4))
@@ -548,14 +2996,13 @@ class FullGUI:
         self.demo_box = ttk.Combobox(demo, values=list(DEFAULT_PRESETS.keys()), state="readonly")
         self.demo_box.pack(side="left", padx=6)
         ttk.Button(demo, text="Apply Demo", command=self.apply_demo).pack(side="left")
-        
+
         self.root.after(100, self._check_server_ready)
+        self.root.after(2000, self._watch_presets)
 
     def load_preset_names(self):
         try:
-            with open(PRESET_FILE, "r") as f:
-                data = json.load(f)
-                return sorted(list(data.keys()))
+            return self.presets.names()
         except Exception:
             return list(DEFAULT_PRESETS.keys())
 
@@ -563,12 +3010,7 @@ class FullGUI:
         name = simpledialog.askstring("Preset name", "Enter preset name:")
         if not name:
             return
-        try:
-            with open(PRESET_FILE, "r") as f:
-                data = json.load(f)
-        except Exception:
-            data = DEFAULT_PRESETS.copy()
-        
+
         preset = {
             "attack": float(0.1),
             "decay": float(0.3),
@@ -576,16 +3018,18 @@ class FullGUI:
             "release": float(0.5),
             "mul": float(0.5)
         }
-        
+
         cur = self.preset_var.get()
         if cur:
-            p = data.get(cur)
+            p = self.presets.get(cur)
             if p:
                 preset.update(p)
-        
-        data[name] = preset
-        with open(PRESET_FILE, "w") as f:
-            json.dump(data, f, indent=2)
+
+        try:
+            self.presets.save(name, preset)
+        except Exception as e:
+            self.update_status(f"Error saving: {e}")
+            return
         self.preset_box['values'] = self.load_preset_names()
         self.preset_var.set(name)
         self.update_status(f"Saved preset '{name}'")
@@ -596,18 +3040,22 @@ class FullGUI:
             return
         if messagebox.askyesno("Delete", f"Delete preset '{cur}'?"):
             try:
-                with open(PRESET_FILE, "r") as f:
-                    data = json.load(f)
-                if cur in data:
-                    del data[cur]
-                    with open(PRESET_FILE, "w") as f:
-                        json.dump(data, f, indent=2)
+                self.presets.delete(cur)
                 self.preset_box['values'] = self.load_preset_names()
                 self.preset_var.set("")
                 self.update_status(f"Deleted preset {cur}")
             except Exception as e:
                 self.update_status(f"Error deleting: {e}")
 
+    def _watch_presets(self):
+        # Pick up edits made to presets.json by other instances or by hand.
+        try:
+            if self.presets.refresh():
+                self.preset_box['values'] = self.load_preset_names()
+        except Exception as e:
+            print(f"[Debug] preset refresh: {e}")
+        self.root.after(2000, self._watch_presets)
+
     def add_current_to_queue(self):
         user = self.code_entry.get().strip()
         if user == "":
@@ -643,29 +3091,38 @@ class FullGUI:
             self.update_status("Queue empty")
             return
         fname_base = self.filename_entry.get().strip() or "out.wav"
-        
-        if not messagebox.askyesno("Render Queue", f"Render {len(items)} items sequentially?"):
+        try:
+            workers = max(1, int(self.workers_entry.get().strip()))
+        except Exception:
+            workers = os.cpu_count() or 1
+
+        if not messagebox.askyesno("Render Queue", f"Render {len(items)} items with {workers} workers?"):
             return
-        
+
+        settings = self.collect_ui()
+        jobs = [{"code": int(it),
+                 "export_file": f"{os.path.splitext(fname_base)[0]}_{idx+1}.wav",
+                 "settings": settings}
+                for idx, it in enumerate(items)]
+
+        farm = RenderFarm(workers, cache_dir=RENDER_CACHE_DIR)
+        self.farm = farm
+
         def worker():
-            for idx, it in enumerate(items):
-                code = int(it)
-                outname = f"{os.path.splitext(fname_base)[0]}_{idx+1}.wav"
-                self.update_status(f"Rendering {it} -> {outname}")
-                settings = self.collect_ui()
-                self.synth.build_and_play(code,
-                                          scale_name=settings['scale'],
-                                          tempo_override=settings['tempo'],
-                                          gb_mode=settings['gb'],
-                                          preset_name=settings['preset'],
-                                          reverb_amount=settings['rev'],
-                                          delay_amount=settings['dly'],
-                                          bitcrush_amount=settings['bit'],
-                                          export_file=outname,
-                                          drums_on=settings['drums'],
-                                          gui_callback=self.update_status,
-                                          length_override=settings['length'])
-            self.update_status("Queue finished")
+            failed = 0
+            with farm:
+                for result in farm.render(jobs):
+                    if result["ok"]:
+                        self.update_status(f"[{result['index']+1}/{len(jobs)}] {result['code']} -> {result['file']}")
+                    elif not result.get("cancelled"):
+                        failed += 1
+                        print(f"[Warning] Render of {result['code']} failed: {result['error']}")
+                        self.update_status(f"[{result['index']+1}/{len(jobs)}] {result['code']} failed: {result['error']}")
+            self.farm = None
+            if farm.cancel_event.is_set():
+                self.update_status("Queue cancelled")
+            else:
+                self.update_status(f"Queue finished ({failed} failed)" if failed else "Queue finished")
         threading.Thread(target=worker, daemon=True).start()
 
     def collect_ui(self):
@@ -687,6 +3144,7 @@ class FullGUI:
                 length = None
         gb = self.gb_var.get()
         drums = self.drum_var.get()
+        offline = self.offline_var.get()
         rev = float(self.rev_scale.get())
         dly = float(self.dly_scale.get())
         bit = float(self.bit_scale.get())
@@ -697,29 +3155,81 @@ class FullGUI:
             'length': length, 
             'gb': gb, 
             'drums': drums, 
+            'offline': offline, 
             'rev': rev, 
             'dly': dly, 
             'bit': bit
         }
 
-    def on_start(self):
-        if self.synth.is_running:
-            self.update_status("Already playing")
+    def on_live_change(self, *_):
+        # FX, tempo and scale edits apply to the track that is playing.
+        if self.synth.live is None:
             return
+        settings = self.collect_ui()
+        self.synth.set_live(**{key: settings[key] for key in LIVE_KEYS})
+
+    def _entry_code(self):
+        """The code in the entry (a random one if empty), or None if it is invalid."""
         user = self.code_entry.get().strip()
         if user == "":
             user = random.randint(1000000, 9999999)
             self.code_entry.delete(0, tk.END)
             self.code_entry.insert(0, str(user))
         try:
-            code = int(user)
+            return int(user)
         except Exception:
             self.update_status("Invalid number")
+            return None
+
+    def _previewing(self):
+        return self.preview is not None and not self.preview.done()
+
+    def on_preview(self):
+        # Plays within a few hundred milliseconds while the rest renders.
+        if self.synth.is_running or self._previewing():
+            self.update_status("Already playing")
+            return
+        if not (HAS_NUMPY and HAS_SOUNDDEVICE):
+            self.update_status("Preview needs numpy and sounddevice")
+            return
+        code = self._entry_code()
+        if code is None:
+            return
+        self.job = RenderJob(code)
+        try:
+            self.preview = ProgressivePreview(code, presets=self.presets, job=self.job,
+                                              **settings_to_kwargs(self.collect_ui())).start()
+        except Exception as e:
+            self.update_status(f"Preview error: {e}")
+            return
+        self._watch_preview()
+
+    def _watch_preview(self):
+        p = self.preview
+        if p is None:
+            return
+        if p.done():
+            self.update_status("Preview stopped" if p.job.cancelled else "Preview finished")
+            return
+        self.update_status(f"Preview {p.position:.1f}s / {p.length:.1f}s (rendered {p.buffered:.1f}s)")
+        self.root.after(250, self._watch_preview)
+
+    def on_skip(self):
+        if self._previewing():
+            self.preview.skip()
+
+    def on_start(self):
+        if self.synth.is_running or self._previewing():
+            self.update_status("Already playing")
+            return
+        code = self._entry_code()
+        if code is None:
             return
         settings = self.collect_ui()
         outname = self.filename_entry.get().strip() or 'out.wav'
         self.update_status("Starting...")
-        threading.Thread(target=self.synth.build_and_play, kwargs={
+        self.job = RenderJob(code, outname)
+        threading.Thread(target=self._run_render, kwargs={
             'code': code,
             'scale_name': settings['scale'],
             'tempo_override': settings['tempo'],
@@ -731,47 +3241,40 @@ class FullGUI:
             'export_file': outname,
             'drums_on': settings['drums'],
             'gui_callback': self.update_status,
-            'length_override': settings['length']
+            'length_override': settings['length'],
+            'offline': settings['offline'],
+            'job': self.job
         }, daemon=True).start()
 
+    def _run_render(self, **kwargs):
+        try:
+            self.synth.build_and_play(**kwargs)
+        except RenderCancelled:
+            pass
+        except Exception as e:
+            print(f"[Warning] Render failed: {e}")
+            self.update_status(f"Error: {e}")
+
     def on_stop(self):
-        if self.synth.is_running:
-            self.update_status("Stopping...")
-            self.synth.stop_server()
-            self.synth.is_running = False
-            self.update_status("Stopped")
-        else:
-            self.update_status("Nothing to stop")
+        # Only flags the jobs; fades and teardown run off the Tk thread and
+        # report back through update_status.
+        stopping = False
+        if self.job is not None and self.job.cancel():
+            stopping = True
+        if self.farm is not None:
+            self.farm.cancel()
+            stopping = True
+        self.update_status("Stopping..." if stopping else "Nothing to stop")
 
     def show_scope(self):
-        if not self.synth.server:
-            try:
-                s = Server()
-                s.boot()
-                s.start()
-                t = SquareTable()
-                o = Osc(table=t, freq=220, mul=0.02).out()
-                try:
-                    Scope(o)
-                    Spectrum(o)
-                except Exception:
-                    pass
-                time.sleep(0.25)
-                try:
-                    o.stop()
-                except Exception:
-                    pass
-                try:
-                    s.recstop()
-                except Exception:
-                    pass
-                s.stop()
-                s.shutdown()
-                self.update_status("Temporary scope shown")
-            except Exception as e:
-                self.update_status(f"Scope error: {e}")
-        else:
-            self.update_status("Scope should be visible (if supported)")
+        # Reads the engine's output monitor; no second server is started.
+        if not HAS_NUMPY:
+            self.update_status("Scope needs numpy")
+            return
+        if self.scope_window is not None and self.scope_window.alive():
+            self.scope_window.top.lift()
+            return
+        self.scope_window = ScopeWindow(self.root, lambda: self.synth.monitor)
 
     def set_random(self):
         r = random.randint(1000000, 9999999)
@@ -783,7 +3286,7 @@ class FullGUI:
         def set_text():
             self.status_var.set(text)
         self.root.after(0, set_text)
-    
+
     def _check_server_ready(self):
         if self.synth.server_ready:
             self.update_status("Bereit - Audio engine ready")
@@ -795,12 +3298,7 @@ class FullGUI:
         name = self.demo_box.get()
         if not name:
             return
-        try:
-            with open(PRESET_FILE, 'r') as f:
-                data = json.load(f)
-        except Exception:
-            data = DEFAULT_PRESETS
-        demo = data.get(name) or DEFAULT_PRESETS.get(name)
+        demo = self.presets.get(name) or DEFAULT_PRESETS.get(name)
         if not demo:
             self.update_status('Demo not found')
             return
@@ -812,13 +3310,634 @@ class FullGUI:
         self.update_status(f"Applied demo preset: {name}")
 
 
+# ---------------- Render Service ----------------
+SERVICE_SOCKET = os.path.join(tempfile.gettempdir(), "synther.sock")
+SERVICE_PROGRESS_INTERVAL = 0.25
+# Finished jobs whose audio stays downloadable; older ones are deleted.
+SERVICE_KEEP_JOBS = 256
+SERVICE_MAX_BODY = 64 * 1024
+SERVICE_CHUNK = 64 * 1024
+AUDIO_TYPES = {"wav": "audio/wav", "flac": "audio/flac"}
+HTTP_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+                405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ServiceJob:
+    """One queued render plus the listeners waiting for its events."""
+    TERMINAL = ("finished", "failed", "cancelled")
+
+    def __init__(self, job_id, spec, priority, fmt, expected_bytes):
+        self.id = job_id
+        self.spec = spec
+        self.priority = priority
+        self.fmt = fmt
+        self.expected_bytes = expected_bytes
+        self.seq = 0
+        self.status = "queued"
+        self.progress = 0.0
+        self.result = None
+        self.listeners = []
+
+    def status_dict(self):
+        info = {"id": self.id, "code": self.spec["code"], "status": self.status,
+                "priority": self.priority, "progress": round(self.progress, 3)}
+        if self.result is not None:
+            info.update(error=self.result.get("error"), cached=self.result.get("cached"),
+                        seconds=self.result.get("seconds"))
+        return info
+
+    def subscribe(self):
+        events = asyncio.Queue()
+        self.listeners.append(events)
+        if self.status in self.TERMINAL:
+            events.put_nowait(dict(self.status_dict(), event=self.status))
+        return events
+
+    def unsubscribe(self, events):
+        if events in self.listeners:
+            self.listeners.remove(events)
+
+    def publish(self, event, **fields):
+        message = dict(self.status_dict(), event=event, **fields)
+        for events in self.listeners:
+            events.put_nowait(message)
+
+
+class RenderService:
+    """asyncio front end that queues render requests onto a RenderFarm.
+
+    Requests are a code plus any FullGUI.collect_ui() keys, an optional
+    "priority" (higher runs first), "engine" and "format" ("wav"/"flac").
+    Two transports are served:
+    - Unix socket: send one JSON line; the reply is NDJSON events
+      (queued, started, progress, finished/failed). A "finished" event
+      carries "bytes", and exactly that many bytes of audio follow it.
+    - HTTP on localhost: POST /render returns the job id; GET /jobs/<id>
+      returns its status; GET /jobs/<id>.<format> returns the audio once
+      it is done.
+    One dispatcher per worker pulls from the priority queue, so a long job
+    only occupies its own worker. Progress comes from the size of the
+    job's .partial file, and workers report nothing back while rendering.
+    """
+    def __init__(self, workers=None, out_dir=None, socket_path=None, host="127.0.0.1", port=None,
+                 cache_dir=RENDER_CACHE_DIR, cache_max_bytes=RENDER_CACHE_MAX_BYTES):
+        self.farm = RenderFarm(workers, cache_dir=cache_dir, cache_max_bytes=cache_max_bytes)
+        self.out_dir = out_dir or tempfile.mkdtemp(prefix="synther-service-")
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.jobs = {}
+        self.queue = None
+        self.seq = 0
+
+    # --- jobs ---
+    def submit(self, data):
+        """Validate a request dict and queue it; returns the ServiceJob."""
+        if not isinstance(data, dict):
+            raise ValueError("request must be a JSON object")
+        fmt = data.get("format", "wav")
+        if fmt not in AUDIO_TYPES:
+            raise ValueError(f"unknown format {fmt!r}")
+        try:
+            priority = int(data.get("priority", 0))
+        except (TypeError, ValueError):
+            raise ValueError("'priority' must be an integer")
+        job_id = f"{int(time.time() * 1000):x}{self.seq:04x}"
+        # Clients never choose where files go.
+        spec = make_job({k: v for k, v in data.items() if k != "export_file"},
+                        os.path.join(self.out_dir, f"{job_id}.{fmt}"))
+        expected = None
+        if fmt == "wav":
+            settings = spec["settings"]
+            length = plan_render(spec["code"], settings.get("scale", "Major"), settings.get("tempo"),
+                                 settings.get("length"))["length"]
+            expected = 44 + int((length + RELEASE_TAIL) * OFFLINE_SR) * 2 * 2
+        job = ServiceJob(job_id, spec, priority, fmt, expected)
+        job.seq = self.seq
+        self.jobs[job_id] = job
+        self.seq += 1
+        self.queue.put_nowait((-priority, job.seq, job))
+        return job
+
+    def queue_position(self, job):
+        """Number of queued jobs that will start before `job`."""
+        key = (-job.priority, job.seq)
+        return sum(1 for j in self.jobs.values()
+                   if j.status == "queued" and (-j.priority, j.seq) < key)
+
+    def cancel(self, job):
+        """Drop a job that has not started yet; running jobs are left to finish."""
+        if job.status == "queued":
+            job.status = "cancelled"
+            job.publish("cancelled")
+            return True
+        return False
+
+    async def _dispatch(self):
+        while True:
+            _, _, job = await self.queue.get()
+            if job.status != "queued":
+                continue
+            job.status = "running"
+            job.publish("started")
+            watcher = asyncio.ensure_future(self._watch_progress(job))
+            try:
+                job.result = await self._run(job)
+            finally:
+                watcher.cancel()
+            if job.result["ok"] and not os.path.exists(job.spec["export_file"]):
+                job.result.update(ok=False, error="render produced no file")
+            job.status = "finished" if job.result["ok"] else "failed"
+            if job.result["ok"]:
+                job.progress = 1.0
+                job.publish("finished", bytes=os.path.getsize(job.spec["export_file"]))
+            else:
+                job.publish("failed")
+            self._prune()
+
+    async def _run(self, job):
+        for attempt in range(1, MAX_JOB_ATTEMPTS + 1):
+            executor = self.farm.executor
+            try:
+                return await asyncio.wrap_future(self.farm.submit(job.spec))
+            except BrokenProcessPool as e:
+                # Several dispatchers can see the same dead pool; restart it once.
+                if self.farm.executor is executor or self.farm.executor is None:
+                    self.farm.restart()
+                error = f"worker crashed: {e}"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                break
+        return {"code": job.spec["code"], "file": job.spec["export_file"], "ok": False,
+                "error": error, "seconds": None}
+
+    async def _watch_progress(self, job):
+        if not job.expected_bytes:
+            return
+        partial = partial_path(job.spec["export_file"])
+        while True:
+            await asyncio.sleep(SERVICE_PROGRESS_INTERVAL)
+            try:
+                done = min(os.path.getsize(partial) / job.expected_bytes, 0.99)
+            except OSError:
+                continue
+            if done >= job.progress + 0.01:
+                job.progress = done
+                job.publish("progress")
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if j.status in ServiceJob.TERMINAL]
+        for job in finished[:max(0, len(finished) - SERVICE_KEEP_JOBS)]:
+            del self.jobs[job.id]
+            try:
+                os.remove(job.spec["export_file"])
+            except OSError:
+                pass
+
+    # --- unix socket ---
+    async def _handle_socket(self, reader, writer):
+        job = events = None
+        try:
+            line = await reader.readline()
+            try:
+                job = self.submit(json.loads(line))
+            except ValueError as e:
+                await self._send_event(writer, {"event": "error", "error": str(e)})
+                return
+            events = job.subscribe()
+            await self._send_event(writer, dict(job.status_dict(), event="queued",
+                                                position=self.queue_position(job)))
+            while True:
+                event = await events.get()
+                await self._send_event(writer, event)
+                if event["event"] in ServiceJob.TERMINAL:
+                    break
+            if job.status == "finished":
+                await self._send_file(writer, job.spec["export_file"])
+        except (ConnectionError, asyncio.IncompleteReadError):
+            if job is not None:
+                self.cancel(job)
+        finally:
+            if events is not None:
+                job.unsubscribe(events)
+            writer.close()
+
+    @staticmethod
+    async def _send_event(writer, event):
+        writer.write((json.dumps(event) + "\n").encode())
+        await writer.drain()
+
+    @staticmethod
+    async def _send_file(writer, path):
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(SERVICE_CHUNK)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+
+    # --- http ---
+    async def _handle_http(self, reader, writer):
+        try:
+            request = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            if len(request) < 2:
+                return await self._http_json(writer, 400, {"error": "bad request line"})
+            method, path = request[0], request[1].split("?")[0]
+            size = int(headers.get("content-length", 0) or 0)
+            if size > SERVICE_MAX_BODY:
+                return await self._http_json(writer, 413, {"error": "body too large"})
+            body = await reader.readexactly(size) if size else b""
+            await self._route(writer, method, path, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            print(f"[Warning] HTTP handler: {e}")
+            try:
+                await self._http_json(writer, 500, {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _route(self, writer, method, path, body):
+        if path == "/render":
+            if method != "POST":
+                return await self._http_json(writer, 405, {"error": "use POST"})
+            try:
+                job = self.submit(json.loads(body or b"{}"))
+            except ValueError as e:
+                return await self._http_json(writer, 400, {"error": str(e)})
+            return await self._http_json(writer, 202, dict(
+                job.status_dict(), position=self.queue_position(job),
+                status_url=f"/jobs/{job.id}", audio_url=f"/jobs/{job.id}.{job.fmt}"))
+        if path.startswith("/jobs/"):
+            if method != "GET":
+                return await self._http_json(writer, 405, {"error": "use GET"})
+            name = path[len("/jobs/"):]
+            job_id, _, ext = name.partition(".")
+            job = self.jobs.get(job_id)
+            if job is None or (ext and ext != job.fmt):
+                return await self._http_json(writer, 404, {"error": "no such job"})
+            if not ext:
+                return await self._http_json(writer, 200, job.status_dict())
+            if job.status == "failed":
+                return await self._http_json(writer, 500, job.status_dict())
+            if job.status != "finished":
+                return await self._http_json(writer, 202, job.status_dict())
+            audio = job.spec["export_file"]
+            self._http_head(writer, 200, AUDIO_TYPES[job.fmt], os.path.getsize(audio))
+            return await self._send_file(writer, audio)
+        return await self._http_json(writer, 404, {"error": "not found"})
+
+    @staticmethod
+    def _http_head(writer, status, content_type, length):
+        writer.write((f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                      f"Content-Type: {content_type}\r\nContent-Length: {length}\r\n"
+                      "Connection: close\r\n\r\n").encode("latin-1"))
+
+    async def _http_json(self, writer, status, payload):
+        body = (json.dumps(payload) + "\n").encode()
+        self._http_head(writer, status, "application/json", len(body))
+        writer.write(body)
+        await writer.drain()
+
+    # --- lifecycle ---
+    async def serve(self):
+        """Serve until cancelled; shuts the farm down on the way out."""
+        self.queue = asyncio.PriorityQueue()
+        servers = []
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            servers.append(await asyncio.start_unix_server(self._handle_socket, path=self.socket_path))
+            print(f"[Info] Render service on unix socket {self.socket_path}")
+        if self.port is not None:
+            servers.append(await asyncio.start_server(self._handle_http, self.host, self.port))
+            print(f"[Info] Render service on http://{self.host}:{self.port}")
+        dispatchers = [asyncio.ensure_future(self._dispatch()) for _ in range(self.farm.workers)]
+        try:
+            await asyncio.gather(*(server.serve_forever() for server in servers))
+        finally:
+            for task in dispatchers:
+                task.cancel()
+            for server in servers:
+                server.close()
+            # Running jobs see the cancel within a buffer, so this wait is short.
+            self.farm.cancel()
+            self.farm.shutdown()
+            if self.socket_path and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+# ---------------- Headless CLI ----------------
+JOB_SETTING_KEYS = ('scale', 'preset', 'tempo', 'length', 'gb', 'drums', 'rev', 'dly', 'bit')
+RENDER_ENGINES = ('pyo', 'numpy')
+
+
+def _job_setting(key, value):
+    """Coerce one FullGUI.collect_ui() setting from a request; raises ValueError."""
+    if key in ('tempo', 'length'):
+        if value is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"'{key}' must be a positive integer")
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValueError(f"'{key}' must be a positive integer")
+        if value <= 0:
+            raise ValueError(f"'{key}' must be a positive integer")
+        return value
+    if key in ('rev', 'dly', 'bit'):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"'{key}' must be a number between 0 and 1")
+        value = float(value)
+        if not 0.0 <= value <= 1.0:
+            raise ValueError(f"'{key}' must be a number between 0 and 1")
+        return value
+    if key in ('gb', 'drums'):
+        if value not in (True, False):
+            raise ValueError(f"'{key}' must be true or false")
+        return bool(value)
+    if key == 'scale':
+        if not isinstance(value, str) or value not in SCALES:
+            raise ValueError(f"unknown scale {value!r}")
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"'{key}' must be a string")
+    return value
+
+
+def make_job(data, export_file):
+    """Build a RenderFarm job from a request dict; raises ValueError on bad input."""
+    if not isinstance(data, dict):
+        raise ValueError("request must be a JSON object")
+    try:
+        code = int(data["code"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("'code' must be an integer")
+    job = {"code": code, "export_file": export_file,
+           "settings": {k: _job_setting(k, data[k]) for k in JOB_SETTING_KEYS if k in data}}
+    if "engine" in data:
+        if data["engine"] not in RENDER_ENGINES:
+            raise ValueError(f"unknown engine {data['engine']!r}")
+        job["engine"] = data["engine"]
+    return job
+
+
+def parse_job_line(line, index, out_dir, ext=".wav"):
+    """Turn one input line into a RenderFarm job, or None for blanks/comments.
+
+    A line is either a bare code ("1234567") or a JSON object with "code",
+    optional "export_file" and "engine", and any of the FullGUI.collect_ui()
+    keys.
+    Malformed lines become jobs with an 'error' so they keep their slot in
+    the ordered output.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    try:
+        data = json.loads(line) if line.startswith("{") else {"code": line}
+        code = int(data["code"])
+        export_file = data.get("export_file") or os.path.join(out_dir, f"{code}_{index+1}{ext}")
+        return make_job(data, export_file)
+    except Exception as e:
+        return {"code": None, "export_file": None, "settings": {},
+                "error": f"bad job line {index+1}: {e}"}
+
+
+def read_jobs(stream, out_dir, ext=".wav", engine="pyo"):
+    index = 0
+    for line in stream:
+        job = parse_job_line(line, index, out_dir, ext)
+        if job is not None:
+            job.setdefault("engine", engine)
+            yield job
+            index += 1
+
+
+def run_render_cli(args):
+    """Render jobs from a file or stdin and print one JSON result per line."""
+    # Results own stdout; everything the engine prints goes to stderr.
+    sys.stdout.flush()
+    results_out = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    stream = sys.stdin if args.jobs == "-" else open(args.jobs, "r")
+    failed = 0
+    try:
+        cache_dir = None if args.no_cache else args.cache_dir
+        with RenderFarm(args.workers, stdout_to_stderr=True, cache_dir=cache_dir,
+                        cache_max_bytes=args.cache_size_mb * 1024 ** 2,
+                        trace_file=args.trace) as farm:
+            for result in farm.render(read_jobs(stream, args.out_dir, "." + args.format, args.engine)):
+                if not result["ok"]:
+                    failed += 1
+                results_out.write(json.dumps(result) + "\n")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        results_out.close()
+    return 1 if failed else 0
+
+
+def run_preview_cli(args):
+    """Render previews of the codes in a file or stdin into one .npy array."""
+    if not HAS_NUMPY:
+        print("FATAL ERROR: preview needs numpy")
+        return 1
+    stream = sys.stdin if args.codes == "-" else open(args.codes, "r")
+    try:
+        codes = [int(line.split()[0]) for line in stream
+                 if line.strip() and not line.startswith("#")]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    start = time.time()
+    settings = {k: v for k, v in settings_to_kwargs({}).items()
+                if k not in ('length_override', 'preset_name')}
+    render_previews(codes, seconds=args.seconds, out=args.output, tail=args.tail,
+                    presets=PresetStore(), preset_name=args.preset, **settings)
+    print(f"[Info] {len(codes)} previews -> {args.output} in {time.time() - start:.1f}s")
+    return 0
+
+
+def run_serve_cli(args):
+    socket_path = args.socket
+    if socket_path is None and args.port is None:
+        socket_path = SERVICE_SOCKET
+    if socket_path and not hasattr(asyncio, "start_unix_server"):
+        print("FATAL ERROR: unix sockets are not available here, use --port")
+        return 1
+    service = RenderService(args.workers, out_dir=args.out_dir, socket_path=socket_path,
+                            host=args.host, port=args.port,
+                            cache_dir=None if args.no_cache else args.cache_dir)
+    try:
+        asyncio.run(service.serve())
+    except KeyboardInterrupt:
+        print("[Info] Render service stopped")
+    return 0
+
+
+STARTUP_MODULES = (("pyo", pyo), ("numpy", np), ("tkinter", tk), ("soundfile", soundfile),
+                   ("sounddevice", sd))
+
+
+def run_startup_cli(args):
+    """Time a cold `import synther` and each lazy import a feature pulls in."""
+    import subprocess
+
+    def cold(code):
+        runs = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], cwd=script_dir, check=True)
+            runs.append(time.perf_counter() - start)
+        return round(sorted(runs)[len(runs) // 2], 4)
+
+    interpreter = cold("pass")
+    with_module = cold("import synther")
+    report = {
+        "python": sys.version.split()[0],
+        "interpreter_s": interpreter,
+        "import_synther_s": round(with_module - interpreter, 4),
+        "module_body_s": round(IMPORT_SECONDS, 4),
+        "lazy_imports_s": {},
+    }
+    for name, module in STARTUP_MODULES:
+        if module.loaded:
+            continue
+        start = time.perf_counter()
+        try:
+            module._load()
+            report["lazy_imports_s"][name] = round(time.perf_counter() - start, 4)
+        except Exception:
+            report["lazy_imports_s"][name] = None
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+def run_monitor_cli(args):
+    """Print the levels of a running engine's output monitor from another process."""
+    ring = MonitorRing(name=args.name)
+    last = -1
+    try:
+        while True:
+            block = ring.latest() if ring.written != last else None
+            last = ring.written
+            if block is not None:
+                peak, rms = monitor_levels(block)
+                print("  ".join(f"ch{c} peak {p:6.1f} rms {r:6.1f}"
+                                for c, (p, r) in enumerate(zip(peak, rms))), flush=True)
+            time.sleep(1.0 / args.fps)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+    return 0
+
+
+def run_probe_cli(args):
+    """Probe buffer sizes and rates on this host and cache the live audio profile."""
+    rates = [int(r) for r in args.rates.split(",")] if args.rates else PROBE_RATES
+    report = probe_audio(rates, seconds=args.seconds)
+    save_audio_profile(report, args.output)
+    print(json.dumps(report["profiles"], indent=2))
+    return 0 if report["profiles"]["live"] else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ben's Mega Synth")
+    sub = parser.add_subparsers(dest="command")
+    render = sub.add_parser("render", help="headless batch render (offline, no display needed)")
+    render.add_argument("jobs", nargs="?", default="-",
+                        help="job file, one code or JSON object per line ('-' = stdin)")
+    render.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    render.add_argument("-o", "--out-dir", default=".",
+                        help="directory for jobs without an export_file")
+    render.add_argument("-f", "--format", choices=("wav", "flac"), default="wav",
+                        help="file format for jobs without an export_file")
+    render.add_argument("--cache-dir", default=RENDER_CACHE_DIR,
+                        help="render cache directory (default: %(default)s)")
+    render.add_argument("--cache-size-mb", type=int, default=RENDER_CACHE_MAX_BYTES // 1024 ** 2,
+                        help="evict least recently used renders above this size")
+    render.add_argument("--no-cache", action="store_true", help="always render from scratch")
+    render.add_argument("--engine", choices=RENDER_ENGINES, default="pyo",
+                        help="pyo server or the NumPy reference renderer (needs numpy)")
+    render.add_argument("--trace", help="append per-stage spans and counters as JSON lines to this file")
+    preview = sub.add_parser("preview", help="render short previews of many codes into one .npy array")
+    preview.add_argument("codes", nargs="?", default="-", help="file with one code per line ('-' = stdin)")
+    preview.add_argument("-o", "--output", default="previews.npy", help="memory-mapped output array")
+    preview.add_argument("--seconds", type=int, default=PREVIEW_SECONDS, help="preview length")
+    preview.add_argument("--preset", default="Pad")
+    preview.add_argument("--tail", action="store_true", help="keep the release tail")
+    serve = sub.add_parser("serve", help="run the render service on a unix socket and/or localhost HTTP")
+    serve.add_argument("--socket", help=f"unix socket path (default {SERVICE_SOCKET} if no --port)")
+    serve.add_argument("--port", type=int, help="also serve HTTP on this port")
+    serve.add_argument("--host", default="127.0.0.1", help="HTTP bind address (default: %(default)s)")
+    serve.add_argument("-w", "--workers", type=int, default=None,
+                       help="worker processes (default: CPU count)")
+    serve.add_argument("-o", "--out-dir", help="where finished audio is kept (default: a temp dir)")
+    serve.add_argument("--cache-dir", default=RENDER_CACHE_DIR,
+                       help="render cache directory (default: %(default)s)")
+    serve.add_argument("--no-cache", action="store_true", help="always render from scratch")
+    probe = sub.add_parser("probe", help="measure audio latency per buffer size and cache the live profile")
+    probe.add_argument("--seconds", type=float, default=PROBE_SECONDS, help="playback time per config")
+    probe.add_argument("--rates", help=f"comma-separated sample rates (default {','.join(map(str, PROBE_RATES))})")
+    probe.add_argument("--output", default=AUDIO_PROFILE_FILE, help="profile cache (default: %(default)s)")
+    monitor = sub.add_parser("monitor", help="print levels of a running engine's output monitor (needs numpy)")
+    monitor.add_argument("name", help="shared memory name the engine logged at playback start")
+    monitor.add_argument("--fps", type=float, default=MONITOR_FPS / 4, help="lines per second")
+    startup = sub.add_parser("startup", help="measure import and startup cost")
+    startup.add_argument("--repeat", type=int, default=5, help="cold starts to take the median of")
+    args = parser.parse_args(argv)
+
+    if args.command == "startup":
+        return run_startup_cli(args)
+    if args.command == "probe":
+        return run_probe_cli(args)
+    if args.command == "monitor":
+        return run_monitor_cli(args)
+    if args.command == "serve":
+        return run_serve_cli(args)
+    if args.command == "render":
+        return run_render_cli(args)
+    if args.command == "preview":
+        return run_preview_cli(args)
+
+    if not HAS_TK:
+        print("FATAL ERROR: tkinter is not available, use the 'render' command")
+        return 1
+    os.chdir(script_dir)
+    gui = FullGUI()
+    gui.root.mainloop()
+    return 0
+
+
+IMPORT_SECONDS = time.perf_counter() - _import_start
+
+
 # ---------------- Main ----------------
 if __name__ == "__main__":
+    # Frozen builds re-run this file in every spawned render worker.
+    multiprocessing.freeze_support()
     try:
-        gui = FullGUI()
-        gui.root.mainloop()
+        exit(main())
     except Exception as e:
         import traceback
         print(f"FATAL ERROR: {e}")
         traceback.print_exc()
-        exit(1)
\ No newline at end of file
+        exit(1)
@@ -6,7 +6,11 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    # synther.py imports these lazily through importlib, which the
+    # analysis cannot see.
+    hiddenimports=['pyo', 'asyncio', 'tkinter', 'tkinter.ttk', 'tkinter.simpledialog',
+                   'tkinter.filedialog', 'tkinter.messagebox', 'numpy', 'soundfile',
+                   'sounddevice', 'multiprocessing.shared_memory'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+
+import synther
+
+# Job functions run in spawned workers, which import them from this module.
+
+
+def stub_runner(job):
+    with open(job["log"], "a") as f:
+        f.write(f"{job['code']}\n")
+    time.sleep(job.get("sleep", 0))
+    if job.get("crash"):
+        os._exit(1)
+    if job.get("fail"):
+        raise RuntimeError("boom")
+    return {"code": job["code"], "file": job["export_file"], "ok": True, "error": None}
+
+
+def slow_runner(job):
+    # Polls the farm-wide cancel flag the way _render_job's RenderJob does.
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        if synther._worker_cancel.is_set():
+            return {"code": job["code"], "file": None, "ok": False, "error": "cancelled",
+                    "cancelled": True}
+        time.sleep(0.02)
+    return {"code": job["code"], "file": None, "ok": True, "error": None}
+
+
+def make_jobs(log, n, extra=None):
+    """n jobs with codes 0..n-1; `extra` maps a code to fields to add to its job."""
+    extra = extra or {}
+    return [dict({"code": i, "export_file": f"{i}.wav", "settings": {}, "log": str(log)},
+                 **extra.get(i, {})) for i in range(n)]
+
+
+def runs(log):
+    with open(log) as f:
+        return [int(line) for line in f]
+
+
+def test_results_in_order_with_failing_job(tmp_path):
+    log = tmp_path / "runs.log"
+    jobs = make_jobs(log, 5, {2: {"fail": True}, 0: {"sleep": 0.3}})
+    with synther.RenderFarm(workers=2, runner=stub_runner) as farm:
+        results = list(farm.render(jobs))
+    assert [r["index"] for r in results] == list(range(5))
+    assert [r["code"] for r in results] == list(range(5))
+    assert [r["ok"] for r in results] == [True, True, False, True, True]
+    assert "RuntimeError: boom" in results[2]["error"]
+
+
+def test_crash_retried_once_then_reported(tmp_path):
+    log = tmp_path / "runs.log"
+    jobs = make_jobs(log, 1, {0: {"crash": True}})
+    with synther.RenderFarm(workers=1, runner=stub_runner) as farm:
+        results = list(farm.render(jobs))
+    assert not results[0]["ok"]
+    assert results[0]["error"].startswith("worker crashed")
+    assert runs(log).count(0) == synther.MAX_JOB_ATTEMPTS
+
+
+def test_results_finished_before_crash_are_kept(tmp_path):
+    log = tmp_path / "runs.log"
+    # Job 1 finishes on the other worker while job 0 is still running.
+    jobs = make_jobs(log, 2, {0: {"crash": True, "sleep": 1.0}})
+    with synther.RenderFarm(workers=2, runner=stub_runner) as farm:
+        results = list(farm.render(jobs))
+    assert [r["ok"] for r in results] == [False, True]
+    assert runs(log).count(1) == 1
+
+
+def test_cancel_drains_submitted_jobs(tmp_path):
+    jobs = iter(make_jobs(tmp_path / "runs.log", 20))
+    farm = synther.RenderFarm(workers=2, runner=slow_runner)
+    try:
+        threading.Timer(1.0, farm.cancel).start()
+        start = time.time()
+        results = list(farm.render(jobs))
+    finally:
+        farm.shutdown()
+    assert time.time() - start < 8
+    # Only what was in flight comes back, and nothing more is taken.
+    assert 0 < len(results) <= 2 * farm.workers
+    assert all(r.get("cancelled") for r in results)
+    assert next(jobs)["code"] == len(results)
@@ -0,0 +1,45 @@
+import os
+
+import synther
+
+
+def test_save_after_torn_journal_line_survives_reload(tmp_path):
+    path = str(tmp_path / "presets.json")
+    store = synther.PresetStore(path)
+    store.save("A", {"mul": 0.1})
+    # A crash mid-append leaves half an op without its newline.
+    with open(store.journal_path, "a") as f:
+        f.write('{"op": "set", "name": "X", "pres')
+    torn_size = os.path.getsize(store.journal_path)
+
+    store = synther.PresetStore(path)
+    assert "A" in store.presets and "X" not in store.presets
+    # Loading is read-only; only the next save repairs the journal.
+    assert os.path.getsize(store.journal_path) == torn_size
+    store.save("B", {"mul": 0.2})
+    store.save("C", {"mul": 0.3})
+
+    reloaded = synther.PresetStore(path)
+    assert reloaded.get("A") == {"mul": 0.1}
+    assert reloaded.get("B") == {"mul": 0.2}
+    assert reloaded.get("C") == {"mul": 0.3}
+    assert "X" not in reloaded.presets
+
+
+def test_readers_do_not_drop_ops_appended_by_a_writer(tmp_path):
+    path = str(tmp_path / "presets.json")
+    writer = synther.PresetStore(path)
+    reader = synther.PresetStore(path)
+    for i in range(6):
+        writer.save(f"P{i}", {"mul": i / 10})
+        reader.get("P0")
+    assert all(f"P{i}" in synther.PresetStore(path).presets for i in range(6))
+
+
+def test_resolve_preset_falls_back_to_defaults_then_pad(tmp_path):
+    store = synther.PresetStore(str(tmp_path / "presets.json"))
+    store.save("Mine", {"mul": 0.7})
+    assert synther.resolve_preset(store, "Mine") == {"mul": 0.7}
+    assert synther.resolve_preset(None, "Mine") == synther.DEFAULT_PRESETS["Pad"]
+    name = next(n for n in synther.DEFAULT_PRESETS if n != "Pad")
+    assert synther.resolve_preset(None, name) == synther.DEFAULT_PRESETS[name]
@@ -0,0 +1,55 @@
+import os
+
+import synther
+
+BASE = dict(preset={"mul": 0.5}, gb_mode=False, reverb_amount=0.4, delay_amount=0.2,
+            bitcrush_amount=0.0, drums_on=True, fileformat=0)
+
+
+def key(code=1234567, scale="Major", tempo=None, length=None, engine="pyo", **changes):
+    plan = synther.plan_render(code, scale, tempo, length)
+    return synther.render_cache_key(plan, engine=engine, **dict(BASE, **changes))
+
+
+def test_key_changes_with_every_parameter_and_engine_version(monkeypatch):
+    base = key()
+    assert key() == base
+    variants = [
+        key(code=7654321), key(scale="Minor"), key(tempo=140), key(length=5),
+        key(engine="numpy"), key(preset={"mul": 0.6}), key(gb_mode=True),
+        key(reverb_amount=0.5), key(delay_amount=0.0), key(bitcrush_amount=0.1),
+        key(drums_on=False), key(fileformat=5),
+    ]
+    assert base not in variants
+    assert len(set(variants)) == len(variants)
+    monkeypatch.setattr(synther, "ENGINE_VERSION", synther.ENGINE_VERSION + 1)
+    assert key() != base
+
+
+def store(cache, tmp_path, name, size, mtime):
+    src = tmp_path / f"{name}.src"
+    src.write_bytes(b"x" * size)
+    cache.store(name, str(src))
+    os.utime(cache.path(name), (mtime, mtime))
+
+
+def test_fetch_copies_and_marks_entry_recent(tmp_path):
+    cache = synther.RenderCache(str(tmp_path / "cache"))
+    store(cache, tmp_path, "aa01", 10, 1000)
+    dest = tmp_path / "out.wav"
+    assert cache.fetch("aa01", str(dest))
+    assert dest.read_bytes() == b"x" * 10
+    assert os.stat(cache.path("aa01")).st_mtime > 1000
+    assert not cache.fetch("bb02", str(tmp_path / "miss.wav"))
+
+
+def test_evict_removes_oldest_first_down_to_max_bytes(tmp_path):
+    cache = synther.RenderCache(str(tmp_path / "cache"), max_bytes=10 ** 9)
+    for i, name in enumerate(["aa01", "bb02", "cc03", "dd04"]):
+        store(cache, tmp_path, name, 100, 1000 + i)
+    # A hit makes the oldest entry the most recent one.
+    cache.fetch("aa01", str(tmp_path / "hit.wav"))
+    cache.max_bytes = 250
+    cache.evict()
+    left = {name for name in ["aa01", "bb02", "cc03", "dd04"] if os.path.exists(cache.path(name))}
+    assert left == {"aa01", "dd04"}
@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+import pytest
+
+import synther
+
+
+@pytest.mark.parametrize("settings", [
+    {"tempo": "fast"}, {"tempo": -1}, {"tempo": [120]}, {"length": 0},
+    {"rev": "lots"}, {"dly": 2.0}, {"bit": True},
+    {"gb": "yes"}, {"drums": 2}, {"scale": "Nope"}, {"scale": None},
+    {"preset": 5}, {"engine": "tape"},
+])
+def test_make_job_rejects_bad_settings(settings):
+    with pytest.raises(ValueError):
+        synther.make_job(dict(code=1234567, **settings), "out.wav")
+
+
+def test_make_job_coerces_settings():
+    job = synther.make_job({"code": "1234567", "tempo": "120", "length": 8.0, "rev": 1,
+                            "dly": 0.5, "bit": 0, "gb": 0, "drums": True, "scale": "Minor",
+                            "preset": "Pad"}, "out.wav")
+    assert job["code"] == 1234567
+    assert job["settings"] == {"tempo": 120, "length": 8, "rev": 1.0, "dly": 0.5, "bit": 0.0,
+                               "gb": False, "drums": True, "scale": "Minor", "preset": "Pad"}
+    assert synther.make_job({"code": 1, "tempo": None}, "out.wav")["settings"] == {"tempo": None}
+
+
+class FakeWriter:
+    def __init__(self):
+        self.data = b""
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def response(self):
+        head, _, body = self.data.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(body)
+
+
+class FakeReader:
+    def __init__(self, line):
+        self.line = line
+
+    async def readline(self):
+        return self.line
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = synther.RenderService(1, out_dir=str(tmp_path / "out"), cache_dir=None)
+    yield service
+    service.farm.shutdown()
+
+
+def route(service, method, path, body=b""):
+    async def go():
+        service.queue = service.queue or asyncio.PriorityQueue()
+        writer = FakeWriter()
+        await service._route(writer, method, path, body)
+        return writer.response()
+    return asyncio.run(go())
+
+
+def test_submit_rejects_bad_requests_with_value_error(service):
+    service.queue = asyncio.PriorityQueue()
+    for data in ([1], {"code": "x"}, {"code": 1, "format": "mp3"},
+                 {"code": 1, "priority": "high"}, {"code": 1, "tempo": "fast"}):
+        with pytest.raises(ValueError):
+            service.submit(data)
+    assert service.jobs == {} and service.queue.empty()
+
+
+@pytest.mark.parametrize("body", [b'{"code": 1, "tempo": "fast"}', b'{"code": 1, "scale": 3}',
+                                  b'{"code": 1, "gb": "no"}', b'[1, 2]'])
+def test_http_render_answers_400_for_bad_settings(service, body):
+    status, payload = route(service, "POST", "/render", body)
+    assert status == 400 and "error" in payload
+
+
+def test_http_routes_queue_and_report_jobs(service):
+    status, payload = route(service, "POST", "/render", b'{"code": 1234567, "tempo": "120"}')
+    assert status == 202 and payload["status"] == "queued" and payload["position"] == 0
+    job = service.jobs[payload["id"]]
+    assert job.spec["settings"] == {"tempo": 120}
+    assert job.spec["export_file"].endswith(f"{job.id}.wav")
+
+    assert route(service, "GET", payload["status_url"]) == (200, job.status_dict())
+    assert route(service, "GET", payload["audio_url"])[0] == 202
+    assert route(service, "GET", f"/jobs/{job.id}.flac")[0] == 404
+    assert route(service, "GET", "/jobs/nope")[0] == 404
+    assert route(service, "GET", "/render")[0] == 405
+    assert route(service, "POST", payload["status_url"])[0] == 405
+    assert route(service, "GET", "/elsewhere")[0] == 404
+
+
+def test_socket_reports_bad_request_as_error_event(service):
+    async def go():
+        service.queue = asyncio.PriorityQueue()
+        writer = FakeWriter()
+        writer.close = lambda: None
+        await service._handle_socket(FakeReader(b'{"code": 1, "rev": "x"}\n'), writer)
+        return writer.data
+    event = json.loads(asyncio.run(go()))
+    assert event["event"] == "error" and "rev" in event["error"]